@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
-from Queue import PriorityQueue
 from bitio import BitReader, BitWriter
+from priority_queues.pq_api import MinPQ
 
 
 class Huffman(object):
@@ -121,20 +121,17 @@ class Huffman(object):
         """
         Build a binary trie and return its root node
         """
-        nodes = PriorityQueue()
-        for char, freq in frequency.iteritems():
-            if freq > 0:
-                nodes.put(self.Node(char, freq))
+        nodes = MinPQ(self.Node(char, freq) for char, freq in frequency.iteritems() if freq > 0)
 
         # merge two smallest tries
-        while nodes.qsize() > 1:
-            left = nodes.get()
-            right = nodes.get()
+        while len(nodes) > 1:
+            left = nodes.pop()
+            right = nodes.pop()
             parent = self.Node(0, left.frequency + right.frequency, left, right)
-            nodes.put(parent)
+            nodes.push(parent)
 
         # return the root node
-        return nodes.get()
+        return nodes.pop()
 
     def _build_code(self, st, node, s):
         """
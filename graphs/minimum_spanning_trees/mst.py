@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-from Queue import Queue
-
 from priority_queues.pq_api import MinPQ
 from union_find.uf import UnionFind
 
@@ -9,24 +7,25 @@ class KruskalMST(object):
     """
     Kruskal's algorithm for finding minimum spanning trees
     It is kind of a greedy algorithm which runs in ElogE where E is the number of edges.
+    Any min priority queue (MinPQ by default) can be used for edges.
     """
 
-    def __init__(self, graph):
+    def __init__(self, graph, pq=None):
         self.graph = graph
         self.weight = 0
         # the resulting minimum spanning tree
-        self.mst = Queue()
-        self.edges = MinPQ()
+        self.mst = []
+        self.edges = MinPQ() if pq is None else pq
         for e in graph:
             self.edges.push(e)
         uf = UnionFind()
-        while self.edges and self.mst.qsize() < len(graph) - 1:
+        while self.edges and len(self.mst) < len(graph) - 1:
             edge = self.edges.pop()
             v = edge.either()
             w = edge.other(v)
-            if not uf.connected(v, w):
-                uf.union(v, w)
-                self.mst.put(edge)
+            # union finds both roots once and tells whether the edge joins two trees
+            if uf.union(v, w):
+                self.mst.append(edge)
                 self.weight += edge.weight
 
     def __iter__(self):
@@ -43,7 +42,7 @@ class PrimsMST(object):
         self.graph = graph
         self.weight = 0
         # the resulting minimum spanning tree
-        self.mst = Queue()
+        self.mst = []
         self.edges = MinPQ()
         self.visited = []
         # visit the root vertex (starting point)
@@ -56,7 +55,7 @@ class PrimsMST(object):
             if v in self.visited and w in self.visited:
                 continue
             else:
-                self.mst.put(edge)
+                self.mst.append(edge)
                 self.weight += edge.weight
                 if v not in self.visited:
                     self._visit(v)
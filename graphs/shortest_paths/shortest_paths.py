@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
-from priority_queues.pq_api import MinPQ
+from priority_queues.pq_api import IndexMinPQ
 from graphs.topological_sort import DepthFirstOrderDigraph
 
 
@@ -9,21 +9,21 @@ class DijkstraSP(object):
     Dijkstra digraph shortest path algorithm which runs ELogV,
     where E is a number of edges and V is a number of vertices.
     Edges must not have negative weights since the algorithm will loop over this negative cycles forever.
+    Any indexed min priority queue (IndexMinPQ by default) can be used.
     """
 
-    def __init__(self, graph, start):
+    def __init__(self, graph, start, pq=None):
         self.graph = graph
         self.start = start
         self.edge_to = dict()
         # in the beginning dist to every vertex is a positive infinity
         self.dist_to = defaultdict(lambda: float('inf'))
-        # TODO: this should be IndexedMinPQ instead
-        # the implementation is here: http://algs4.cs.princeton.edu/24pq/IndexMinPQ.java.html
-        self.pq = MinPQ()
+        # vertices are indexes, distances to them are keys
+        self.pq = IndexMinPQ() if pq is None else pq
 
         # set the distance to the starting point to 0
         self.dist_to[start] = 0
-        self.pq.push(start)
+        self.pq.insert(start, 0)
         while self.pq:
             v = self.pq.pop()
             for edge in self.graph.iter_adjacent(v):
@@ -37,10 +37,9 @@ class DijkstraSP(object):
             self.dist_to[w] = self.dist_to[v] + edge.weight
             self.edge_to[w] = edge
             if w not in self.pq:
-                self.pq.push(w)
+                self.pq.insert(w, self.dist_to[w])
             else:
-                # TODO: update the priority queue here (decrease key)
-                pass
+                self.pq.decrease_key(w, self.dist_to[w])
 
     def path_to(self, v):
         if v in self.edge_to:
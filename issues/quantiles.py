@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+from bisect import bisect_left
+
+
+class KLLSketch(object):
+    """
+    KLL streaming quantiles sketch (Karnin, Lang, Liberty 2016)
+    Keeps a hierarchy of compactors: level h holds items with weight 2^h.
+    When a compactor is full it is sorted and every second item (random offset) is promoted
+    to the next level with double weight, so the memory is bounded by O(k) items
+    no matter how long the stream is.
+    Insert is amortized O(logk), not O(1): a full compactor of the bottom level is sorted every time.
+    The bottom levels shrink geometrically as the sketch grows, so the cost goes down for streams
+    much longer than k, but O(1) is not guaranteed.
+    Rank error is ~1.65 / k of the stream length with high probability.
+    Sketches built on different workers can be merged.
+    """
+
+    def __init__(self, k=200, c=2.0 / 3):
+        self.k = k
+        self.c = c
+        self.compactors = []
+        # number of items held in all the compactors and its limit
+        self.size = 0
+        self.max_size = 0
+        # number of items seen
+        self.n = 0
+        self._grow()
+
+    def _capacity(self, h):
+        """
+        Lower levels get less capacity: k * c^(height - h - 1)
+        """
+        height = len(self.compactors)
+        return int(math.ceil(self.k * self.c ** (height - h - 1))) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in xrange(len(self.compactors)))
+
+    def update(self, item):
+        """
+        Add item from the stream
+        """
+        self.compactors[0].append(item)
+        self.size += 1
+        self.n += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        """
+        Merge other sketch into this one
+        """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, compactor in enumerate(other.compactors):
+            self.compactors[h].extend(compactor)
+        self.n += other.n
+        self.size = sum(len(compactor) for compactor in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for h in xrange(len(self.compactors)):
+            if len(self.compactors[h]) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self._grow()
+                compactor = self.compactors[h]
+                before = len(compactor)
+                promoted = self._compact(compactor)
+                self.compactors[h + 1].extend(promoted)
+                self.size -= before - len(compactor) - len(promoted)
+                # compress lazily: stop as soon as there is a free space
+                if self.size < self.max_size:
+                    break
+
+    @staticmethod
+    def _compact(compactor):
+        """
+        Sort compactor and remove every second item from it (starting at random offset),
+        the other half is returned to be promoted. The odd item stays in the compactor.
+        """
+        compactor.sort()
+        last = compactor.pop() if len(compactor) % 2 else None
+        promoted = compactor[random.randint(0, 1)::2]
+        del compactor[:]
+        if last is not None:
+            compactor.append(last)
+        return promoted
+
+    def _weighted(self):
+        """
+        Returns sorted items and cumulative weights
+        """
+        weighted = []
+        for h, compactor in enumerate(self.compactors):
+            weighted.extend((item, 2 ** h) for item in compactor)
+        weighted.sort()
+        items = []
+        cumulates = []
+        total = 0
+        for item, weight in weighted:
+            total += weight
+            items.append(item)
+            cumulates.append(total)
+        return items, cumulates
+
+    def rank(self, item):
+        """
+        Estimated number of stream items which are not greater than item
+        """
+        return sum(2 ** h * sum(1 for x in compactor if x <= item) for h, compactor in enumerate(self.compactors))
+
+    def quantile(self, q):
+        """
+        Estimated q-quantile (0 <= q <= 1) of the stream: 0.5 is median, 0.99 is p99
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """
+        Estimated quantiles for every q in qs
+        """
+        if self.n == 0:
+            raise IndexError('Sketch is empty')
+        items, cumulates = self._weighted()
+        total = cumulates[-1]
+        return [items[min(bisect_left(cumulates, q * total), len(items) - 1)] for q in qs]
+
+    def __len__(self):
+        return self.n
+
+
+if __name__ == '__main__':
+    from issues.selection import selection
+
+    stream = [random.gauss(0, 1) for _ in xrange(100000)]
+    # sketches are built on different workers and merged
+    sketches = [KLLSketch() for _ in xrange(4)]
+    for i, item in enumerate(stream):
+        sketches[i % 4].update(item)
+    sketch = sketches[0]
+    for other in sketches[1:]:
+        sketch.merge(other)
+    assert len(sketch) == len(stream)
+    assert sketch.size < 1000
+    assert sketch.size == sum(len(compactor) for compactor in sketch.compactors)
+
+    n = len(stream)
+    for q in (0.5, 0.95, 0.99):
+        estimated = sketch.quantile(q)
+        exact = selection(stream[:], int(q * (n - 1)))
+        # compare ranks of estimated and exact quantile
+        error = abs(sum(1 for x in stream if x <= estimated) - sum(1 for x in stream if x <= exact)) / float(n)
+        print 'p{:<3} exact={:.4f} estimated={:.4f} rank error={:.4f}'.format(int(q * 100), exact, estimated, error)
+        assert error < 0.02
@@ -2,28 +2,208 @@
 import sys
 import os
 sys.path.append(os.pardir)
+import math
+import random
+from bisect import bisect_left
 from sorting import quick_sort
+from sorting.insertion_sort import insertion_sort
+from priority_queues.pq_api import MaxPQ
+from priority_queues.topk import TopK
 
 
 def selection(items, k):
     """
-    Selection issue using _partition function
+    Selection issue: returns k-th smallest item (see introselect)
+    """
+    return introselect(items, k)
+
+
+def introselect(items, k, lo=0, hi=None):
+    """
+    Quick select with random pivots which switches to median of medians pivots
+    when partitioning goes bad, so it runs linear time in the worst case.
+    Rearranges lo..hi range so that k-th smallest item is at index k,
+    smaller items are on the left and bigger are on the right. Returns the k-th smallest item.
+    """
+    if hi is None:
+        hi = len(items) - 1
+    return _select(items, k, lo, hi, _depth_limit(hi - lo + 1))
+
+
+def _select(items, k, lo, hi, depth):
+    """
+    Selection loop which tries depth random pivots, depth 0 is pure median of medians
     """
-    lo = 0
-    hi = len(items) - 1
     while hi > lo:
-        pivot = quick_sort._partition(items, lo, hi)
+        pivot = _partition(items, lo, hi, depth)
+        depth -= 1
         if pivot < k:
             lo = pivot + 1
         elif pivot > k:
             hi = pivot - 1
         else:
-            return items[k]
-
+            break
     return items[k]
 
 
+def select_many(items, ks):
+    """
+    Finds several order statistics at once: every partition is shared by all the ranks it splits.
+    Rearranges items and returns the list of k-th smallest items for every k in ks.
+    """
+    _select_many(items, 0, len(items) - 1, sorted(set(ks)), _depth_limit(len(items)))
+    return [items[k] for k in ks]
+
+
+def partial_sort(items, k):
+    """
+    Rearranges items so that the first k of them are the smallest ones in sorted order
+    """
+    k = min(k, len(items))
+    if k <= 0:
+        return
+    introselect(items, k - 1)
+    quick_sort._introsort(items, 0, k - 1, _depth_limit(k), quick_sort.INSERTION_SORT_CUTOFF)
+
+
+def nsmallest(items, k):
+    """
+    Returns sorted list of k smallest items. Items are not changed.
+    Lists are copied and partitioned, any other iterables (streams)
+    are consumed with a max priority queue which never holds more than k items.
+    """
+    if k <= 0:
+        return []
+    if isinstance(items, list):
+        items = items[:]
+        partial_sort(items, k)
+        return items[:k]
+    pq = MaxPQ()
+    for item in items:
+        if len(pq) < k:
+            pq.push(item)
+        elif item < pq.max:
+            # the biggest of the smallest items is out
+            pq.pop()
+            pq.push(item)
+    result = [pq.pop() for _ in xrange(len(pq))]
+    result.reverse()
+    return result
+
+
+def nlargest(items, k):
+    """
+    Returns list of k largest items in descending order. Items are not changed.
+    Lists are copied and partitioned, any other iterables (streams)
+    are consumed with TopK which never holds more than k items.
+    """
+    if k <= 0:
+        return []
+    if isinstance(items, list):
+        items = items[:]
+        n = len(items)
+        k = min(k, n)
+        introselect(items, n - k)
+        largest = items[n - k:]
+        quick_sort.introsort(largest)
+        largest.reverse()
+        return largest
+    top = TopK(k)
+    top.offer_many(items)
+    return top.items()
+
+
+def _depth_limit(n):
+    """
+    Number of random pivots tried before switching to median of medians
+    """
+    return 2 * int(math.log(n, 2)) if n > 1 else 0
+
+
+def _partition(items, lo, hi, depth):
+    """
+    Partitions lo..hi range around random pivot or median of medians if depth limit is reached.
+    Returns the final index of pivot.
+    """
+    if depth > 0:
+        pivot = random.randint(lo, hi)
+    else:
+        pivot = _median_of_medians(items, lo, hi)
+    items[lo], items[pivot] = items[pivot], items[lo]
+    return quick_sort._partition(items, lo, hi)
+
+
+def _median_of_medians(items, lo, hi):
+    """
+    Returns index of the pivot which is guaranteed to be greater than ~30% items and less than ~30% items:
+    medians of groups of 5 items are moved to the beginning of the range and their median is selected.
+    """
+    if hi - lo < 5:
+        insertion_sort(items, lo, hi)
+        return lo + (hi - lo) / 2
+    m = lo
+    for group in xrange(lo, hi + 1, 5):
+        end = min(group + 4, hi)
+        insertion_sort(items, group, end)
+        median = group + (end - group) / 2
+        items[m], items[median] = items[median], items[m]
+        m += 1
+    mid = lo + (m - 1 - lo) / 2
+    # the median of medians is selected with median of medians pivots too, random pivots would lose the bound
+    _select(items, mid, lo, m - 1, 0)
+    return mid
+
+
+def _select_many(items, lo, hi, ks, depth):
+    """
+    Places every k-th smallest item of the sorted ranks ks to its place in lo..hi range
+    """
+    while ks:
+        if len(ks) == 1:
+            _select(items, ks[0], lo, hi, depth)
+            return
+        pivot = _partition(items, lo, hi, depth)
+        depth -= 1
+        i = bisect_left(ks, pivot)
+        left = ks[:i]
+        right = ks[i + 1:] if i < len(ks) and ks[i] == pivot else ks[i:]
+        # recurse on the smaller set of ranks, loop on the bigger one
+        if len(left) < len(right):
+            _select_many(items, lo, pivot - 1, left, depth)
+            ks, lo = right, pivot + 1
+        else:
+            _select_many(items, pivot + 1, hi, right, depth)
+            ks, hi = left, pivot - 1
+
+
 if __name__ == '__main__':
     items = [1, 6, 2, 7, 3]
     s = selection(items, 1)
-    print 's=', s, 'items=', items
\ No newline at end of file
+    print 's=', s, 'items=', items
+
+    data = [random.randint(0, 1000) for _ in xrange(10000)]
+    expected = sorted(data)
+    assert nsmallest(data, 10) == expected[:10]
+    assert nsmallest(iter(data), 10) == expected[:10]
+    assert nlargest(data, 10) == expected[:-11:-1]
+    assert nlargest(iter(data), 10) == expected[:-11:-1]
+    items = data[:]
+    assert select_many(items, [5000, 0, 9999, 100, 100]) == [expected[k] for k in (5000, 0, 9999, 100, 100)]
+    items = data[:]
+    partial_sort(items, 100)
+    assert items[:100] == expected[:100]
+    assert introselect(range(10000), 5000) == 5000
+
+    # once the depth limit is reached no random pivots are taken any more
+    randint = random.randint
+
+    def no_random(a, b):
+        raise AssertionError('random pivot after the fallback')
+
+    random.randint = no_random
+    try:
+        for k in (0, 1234, 5000, 9999):
+            items = data[:]
+            assert _select(items, k, 0, len(items) - 1, 0) == expected[k]
+    finally:
+        random.randint = randint
@@ -1,221 +1,993 @@
 # -*- coding: utf-8 -*-
 
 """
+Event driven simulation of colliding balls (see http://algs4.cs.princeton.edu/61event/)
 Requirements:
-python-tk
+python-tk (TkRenderer only, the simulation itself runs headless)
+numpy (optional, vectorized collisions prediction)
 """
 import random
 import math
-import Tkinter as tk
-from pq_api import MinPQ
+import struct
+import time
+from abc import ABCMeta, abstractmethod
+from array import array
+from collections import defaultdict
+from priority_queues.pq_api import MinPQ
+
+try:
+    import Tkinter as tk
+except ImportError:
+    tk = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 CANVAS_SIZE = (600, 600)
-
-
-class Ball(object):
-
-    def __init__(self, canvas, radius=None, x=None, y=None, vx=None, vy=None, color=None):
-        self.radius = radius if radius is not None else random.randint(3, 15)
-        self.x = x if x is not None else random.randint(self.radius, CANVAS_SIZE[0] - self.radius)
-        self.y = y if y is not None else random.randint(self.radius, CANVAS_SIZE[1] - self.radius)
-        self.vx = vx if vx is not None else random.randint(-5, 5)
-        self.vy = vy if vy is not None else random.randint(-5, 5)
-        self.color = color if color is not None else random.choice(['blue', 'red', 'green', 'orange', 'yellow'])
-        self._id = canvas.create_oval(self.x - self.radius, self.y - self.radius, self.x + self.radius,
-                                      self.y + self.radius,
-                                      width=0, fill=self.color)
-        self.canvas = canvas
-
-    @property
-    def mass(self):
+INF = float('inf')
+# the smallest candidate set which is predicted with numpy, smaller ones are cheaper in scalar math
+VECTORIZE_CUTOFF = 32
+
+
+class Particles(object):
+    """
+    State of the particles in contiguous arrays (struct of arrays): particle i is x[i], y[i], vx[i], ...
+    Position (x, y) is known at time t of the last update and it is extrapolated lazily,
+    so only the particles involved in an event are moved.
+    count is the number of events of the particle (collisions and grid cell crossings),
+    it invalidates the events predicted before.
+    Arrays are array.array, so per event math works on plain floats, and numpy uses the same memory
+    to predict a particle against a candidate set (or all the candidate pairs) in a single pass.
+    """
+    FIELDS = ('x', 'y', 'vx', 'vy', 'radius', 'mass', 't')
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('d'))
+        self.count = array('l')
+        # numpy views of the arrays, they are dropped when arrays grow
+        self._views = None
+
+    def add(self, radius, x, y, vx, vy, mass, t=0.0):
         """
-        Mass of the ball depends on its radius
+        Add a particle and return its index
         """
-        return self.radius
+        for name, value in zip(self.FIELDS, (x, y, vx, vy, radius, mass, t)):
+            getattr(self, name).append(value)
+        self.count.append(0)
+        self._views = None
+        return len(self.count) - 1
 
-    def move(self, root, time):
-        x, y = self.x, self.y
-        self.x += self.vx
-        self.y += self.vy
+    def views(self):
+        """
+        numpy arrays which share memory with the state arrays
+        """
+        if self._views is None:
+            self._views = [numpy.frombuffer(getattr(self, name), dtype=numpy.float64) for name in self.FIELDS]
+        return self._views
 
-        def _move():
-            # move the ball on the canvas
-            self.canvas.move(self._id, self.x - x, self.y - y)
+    def move(self, i, t):
+        """
+        Move particle i to its position at time t
+        """
+        dt = t - self.t[i]
+        self.x[i] += self.vx[i] * dt
+        self.y[i] += self.vy[i] * dt
+        self.t[i] = t
 
-        if time > 0:
-            for t in xrange(int(round(time))):
-                root.after(50, _move)
+    def position(self, i, t):
+        dt = t - self.t[i]
+        return self.x[i] + self.vx[i] * dt, self.y[i] + self.vy[i] * dt
 
     # collisions prediction
-    def time_to_hit(self, ball):
-        if self != ball:
-            dx = ball.x - self.x
-            dy = ball.y = self.y
-            dvx = ball.vx - self.vx
-            dvy = ball.vy - self.vy
-            dvdr = dx * dvx + dy * dvy
-            if dvdr <= 0:
-                # omg math
-                dvdv = dvx * dvx + dvy * dvy
-                drdr = dx * dx + dy * dy
-                sigma = self.radius + ball.radius
-                d = dvdr * dvdr - dvdv * (drdr - sigma * sigma)
-                if d >= 0:
-                    try:
-                        return -(dvdr + math.sqrt(d)) / dvdv
-                    except ZeroDivisionError:
-                        return float('inf')
-        # no collision -> collision time will never be reached
-        return float('inf')
-
-    def time_to_hit_v(self):
-        """
-        Time to hit a vertical wall
-        """
-        # TODO: implement this
-        raise NotImplemented
-
-    def time_to_hit_h(self):
-        """
-        Time to hit a horizontal wall
-        """
-        # TODO: implement this
-        raise NotImplemented
+    def time_to_hit(self, i, j):
+        """
+        Time (after t[i]) for particle i to hit particle j, inf if they never collide
+        """
+        if i == j:
+            return INF
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        dt = self.t[i] - self.t[j]
+        dx = x[j] + vx[j] * dt - x[i]
+        dy = y[j] + vy[j] * dt - y[i]
+        dvx = vx[j] - vx[i]
+        dvy = vy[j] - vy[i]
+        dvdr = dx * dvx + dy * dvy
+        if dvdr >= 0:
+            # the particles move apart
+            return INF
+        dvdv = dvx * dvx + dvy * dvy
+        drdr = dx * dx + dy * dy
+        sigma = self.radius[i] + self.radius[j]
+        d = dvdr * dvdr - dvdv * (drdr - sigma * sigma)
+        if d < 0:
+            # the particles miss each other
+            return INF
+        return -(dvdr + math.sqrt(d)) / dvdv
+
+    def times_to_hit(self, i, candidates):
+        """
+        Times for particle i to hit every candidate
+        """
+        return self.pairs_times_to_hit([i] * len(candidates), candidates)
 
-    # collisions resolution
-    def bounce_off(self, ball):
+    def pairs_times_to_hit(self, first, second):
         """
-        Bounce off another ball
+        Times (after t[i]) for particle first[k] to hit particle second[k] for every k,
+        big batches are computed with numpy in one pass with the same math as time_to_hit
         """
-        dx = ball.x - self.x
-        dy = ball.y - self.y
-        dvx = ball.vx - self.vx
-        dvy = ball.vy - self.vy
+        if numpy is None or len(first) < VECTORIZE_CUTOFF:
+            return [self.time_to_hit(i, j) for i, j in zip(first, second)]
+        x, y, vx, vy, radius, _, t = self.views()
+        i = numpy.array(first, dtype=numpy.intp)
+        j = numpy.array(second, dtype=numpy.intp)
+        dt = t[i] - t[j]
+        dx = x[j] + vx[j] * dt - x[i]
+        dy = y[j] + vy[j] * dt - y[i]
+        dvx = vx[j] - vx[i]
+        dvy = vy[j] - vy[i]
         dvdr = dx * dvx + dy * dvy
-        dist = ball.radius + self.radius
-        j = 2 * ball.mass * self.mass * dvdr / ((ball.mass + self.mass) * dist)
-        jx = j * dx / dist
-        jy = j * dy / dist
-        # update the speed (vector) of two balls
-        self.vx += jx / self.mass
-        self.vy += jy / self.mass
-        ball.vx -= jx / ball.mass
-        ball.vy -= jy / ball.mass
+        dvdv = dvx * dvx + dvy * dvy
+        drdr = dx * dx + dy * dy
+        sigma = radius[i] + radius[j]
+        d = dvdr * dvdr - dvdv * (drdr - sigma * sigma)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            times = -(dvdr + numpy.sqrt(d)) / dvdv
+        times[(dvdr >= 0) | (d < 0) | (i == j)] = INF
+        return times.tolist()
+
+    def time_to_hit_v(self, i, width=CANVAS_SIZE[0]):
+        """
+        Time (after t[i]) to hit a vertical wall
+        """
+        vx = self.vx[i]
+        if vx > 0:
+            return (width - self.radius[i] - self.x[i]) / vx
+        if vx < 0:
+            return (self.radius[i] - self.x[i]) / vx
+        return INF
+
+    def time_to_hit_h(self, i, height=CANVAS_SIZE[1]):
+        """
+        Time (after t[i]) to hit a horizontal wall
+        """
+        vy = self.vy[i]
+        if vy > 0:
+            return (height - self.radius[i] - self.y[i]) / vy
+        if vy < 0:
+            return (self.radius[i] - self.y[i]) / vy
+        return INF
 
-    def bounce_off_v(self):
+    # collisions resolution
+    def bounce_off(self, i, j):
+        """
+        Particles i and j bounce off each other, both must be moved to the time of collision
+        """
+        dx = self.x[j] - self.x[i]
+        dy = self.y[j] - self.y[i]
+        dvx = self.vx[j] - self.vx[i]
+        dvy = self.vy[j] - self.vy[i]
+        dvdr = dx * dvx + dy * dvy
+        dist = self.radius[i] + self.radius[j]
+        mass_i, mass_j = self.mass[i], self.mass[j]
+        impulse = 2 * mass_i * mass_j * dvdr / ((mass_i + mass_j) * dist)
+        jx = impulse * dx / dist
+        jy = impulse * dy / dist
+        # update the speed (vector) of two particles
+        self.vx[i] += jx / mass_i
+        self.vy[i] += jy / mass_i
+        self.vx[j] -= jx / mass_j
+        self.vy[j] -= jy / mass_j
+        self.count[i] += 1
+        self.count[j] += 1
+
+    def bounce_off_v(self, i):
         """
         Bounce off a vertical wall
         """
-        self.vx = -self.vx
+        self.vx[i] = -self.vx[i]
+        self.count[i] += 1
 
-    def bounce_off_h(self):
+    def bounce_off_h(self, i):
         """
         Bounce off a horizontal wall
         """
-        self.vy = -self.vy
+        self.vy[i] = -self.vy[i]
+        self.count[i] += 1
 
+    def kinetic_energy(self, i):
+        return 0.5 * self.mass[i] * (self.vx[i] * self.vx[i] + self.vy[i] * self.vy[i])
 
-class EventBase(object):
+    def __len__(self):
+        return len(self.count)
 
-    def __init__(self, time):
-        self.time = time
 
-    def __cmp__(self, other):
-        if self.time < other.time:
-            return -1
-        elif self.time > other.time:
-            return 1
-        else:
-            return 0
+def _field(name):
+    """
+    Property of Ball which reads and writes its element of Particles array
+    """
+    def get(self):
+        return getattr(self.particles, name)[self.index]
+
+    def set(self, value):
+        getattr(self.particles, name)[self.index] = value
+
+    return property(get, set)
+
+
+class Ball(object):
+    """
+    A ball is a view of one particle in Particles arrays
+    A new ball gets its own Particles, CollisionSystem moves all its balls into shared arrays.
+    Balls of different arrays collide through a temporary pair of particles with the same math.
+    """
+    x = _field('x')
+    y = _field('y')
+    vx = _field('vx')
+    vy = _field('vy')
+    radius = _field('radius')
+    mass = _field('mass')
+    t = _field('t')
+    count = _field('count')
+
+    def __init__(self, radius=None, x=None, y=None, vx=None, vy=None, mass=None, color=None, size=CANVAS_SIZE):
+        radius = radius if radius is not None else random.randint(3, 15)
+        x = x if x is not None else random.uniform(radius, size[0] - radius)
+        y = y if y is not None else random.uniform(radius, size[1] - radius)
+        vx = vx if vx is not None else random.uniform(-5, 5)
+        vy = vy if vy is not None else random.uniform(-5, 5)
+        # mass of the ball depends on its radius by default
+        mass = mass if mass is not None else radius
+        self.color = color if color is not None else random.choice(['blue', 'red', 'green', 'orange', 'yellow'])
+        self.particles = Particles()
+        self.index = self.particles.add(radius, x, y, vx, vy, mass)
+
+    def attach(self, particles):
+        """
+        Move the state of the ball into particles arrays
+        """
+        count = self.count
+        self.index = particles.add(self.radius, self.x, self.y, self.vx, self.vy, self.mass, self.t)
+        self.particles = particles
+        self.count = count
+
+    def _pair(self, ball):
+        """
+        Particles 0 and 1 with the state of this ball and the other one
+        """
+        pair = Particles()
+        for b in (self, ball):
+            pair.add(b.radius, b.x, b.y, b.vx, b.vy, b.mass, b.t)
+        return pair
+
+    def move(self, t):
+        self.particles.move(self.index, t)
+
+    def position(self, t):
+        return self.particles.position(self.index, t)
+
+    # collisions prediction
+    def time_to_hit(self, ball):
+        if ball.particles is self.particles:
+            return self.particles.time_to_hit(self.index, ball.index)
+        return self._pair(ball).time_to_hit(0, 1)
 
-    def is_valid(self, time):
-        return self.time != float('inf') and self.time > time
+    def time_to_hit_v(self, width=CANVAS_SIZE[0]):
+        return self.particles.time_to_hit_v(self.index, width)
+
+    def time_to_hit_h(self, height=CANVAS_SIZE[1]):
+        return self.particles.time_to_hit_h(self.index, height)
+
+    # collisions resolution
+    def bounce_off(self, ball):
+        if ball.particles is self.particles:
+            self.particles.bounce_off(self.index, ball.index)
+            return
+        pair = self._pair(ball)
+        pair.bounce_off(0, 1)
+        for k, b in enumerate((self, ball)):
+            b.vx, b.vy = pair.vx[k], pair.vy[k]
+            b.count += 1
+
+    def bounce_off_v(self):
+        self.particles.bounce_off_v(self.index)
+
+    def bounce_off_h(self):
+        self.particles.bounce_off_h(self.index)
+
+    @property
+    def kinetic_energy(self):
+        return self.particles.kinetic_energy(self.index)
+
+
+class EventBase(object):
+    """
+    An event predicted at some time for balls a and b (indexes or None):
+    their collision counts are remembered, so the event is invalid
+    if any of them collides with something else before.
+    Events of the same time are ordered by kind and balls, so the order does not depend on the heap layout.
+    """
+    __metaclass__ = ABCMeta
+    __slots__ = ('time', 'a', 'b', 'count_a', 'count_b')
+    KIND = None
+
+    def __init__(self, time, a=None, b=None, count_a=0, count_b=0):
+        self.time = time
+        self.a = a
+        self.b = b
+        self.count_a = count_a
+        self.count_b = count_b
+
+    def __lt__(self, other):
+        if self.time != other.time:
+            return self.time < other.time
+        return (self.KIND, self.a, self.b) < (other.KIND, other.a, other.b)
+
+    def is_valid(self, counts):
+        return ((self.a is None or counts[self.a] == self.count_a) and
+                (self.b is None or counts[self.b] == self.count_b))
+
+    @abstractmethod
+    def resolve(self, system):
+        """
+        Apply the event to the system at its time
+        """
+        pass
 
     def __repr__(self):
         return '<{} {}>'.format(self.__class__.__name__, self.time)
 
 
 class EventBall(EventBase):
+    __slots__ = ()
+    KIND = 0
 
-    def __init__(self, ball1, ball2, *args, **kwargs):
-        super(EventBall, self).__init__(*args, **kwargs)
-        self.a = ball1
-        self.b = ball2
+    def __init__(self, a, b, time, count_a, count_b):
+        super(EventBall, self).__init__(time, a, b, count_a, count_b)
+
+    def resolve(self, system):
+        particles = system.particles
+        particles.move(self.a, self.time)
+        particles.move(self.b, self.time)
+        particles.bounce_off(self.a, self.b)
+        system.predict(self.a)
+        system.predict(self.b)
 
 
 class EventWallVertical(EventBase):
+    __slots__ = ()
+    KIND = 1
+
+    def __init__(self, a, time, count_a):
+        super(EventWallVertical, self).__init__(time, a, None, count_a)
 
-    def __init__(self, ball, *args, **kwargs):
-        super(EventWallVertical, self).__init__(*args, **kwargs)
-        self.a = ball
+    def resolve(self, system):
+        system.particles.move(self.a, self.time)
+        system.particles.bounce_off_v(self.a)
+        system.predict(self.a)
 
 
 class EventWallHorizontal(EventBase):
+    __slots__ = ()
+    KIND = 2
+
+    def __init__(self, a, time, count_a):
+        super(EventWallHorizontal, self).__init__(time, a, None, count_a)
+
+    def resolve(self, system):
+        system.particles.move(self.a, self.time)
+        system.particles.bounce_off_h(self.a)
+        system.predict(self.a)
+
+
+class EventCellCrossing(EventBase):
+    """
+    The ball center crosses the border of its grid cell
+    """
+    __slots__ = ('cell',)
+    KIND = 3
+
+    def __init__(self, a, time, count_a, cell):
+        super(EventCellCrossing, self).__init__(time, a, None, count_a)
+        self.cell = cell
+
+    def resolve(self, system):
+        system.particles.move(self.a, self.time)
+        system.cross(self.a, self.cell)
+        system.predict(self.a)
+
+
+class EventRedraw(EventBase):
+    __slots__ = ()
+    KIND = 4
+
+    def resolve(self, system):
+        system.renderer.draw(system)
+        system.pq.push(EventRedraw(self.time + 1.0 / system.hz))
+
+
+class EventCheckpoint(EventBase):
+    __slots__ = ()
+    KIND = 5
+
+    def resolve(self, system):
+        system.pq.push(EventCheckpoint(self.time + system.checkpoint_interval))
+        system.on_checkpoint(system)
+
+
+class EventLog(object):
+    """
+    Compact binary log of the processed events which move balls:
+    ball collisions with the velocities of both balls after it (49 bytes),
+    wall collisions with the new velocity (29 bytes) and cell crossings with the new cell (21 bytes).
+    Records start with the event kind. Replaying the log from a checkpoint moves the balls
+    exactly (bit-for-bit) as the simulation did without predicting anything.
+    """
+    RECORDS = {
+        EventBall.KIND: struct.Struct('<Bdiidddd'),
+        EventWallVertical.KIND: struct.Struct('<Bdidd'),
+        EventWallHorizontal.KIND: struct.Struct('<Bdidd'),
+        EventCellCrossing.KIND: struct.Struct('<Bdiii'),
+    }
+    CHUNK = 1 << 16
+
+    def __init__(self, file):
+        self.file = file
+        self.records = 0
+
+    def write(self, event, particles):
+        kind = event.KIND
+        a, b = event.a, event.b
+        if kind == EventBall.KIND:
+            record = self.RECORDS[kind].pack(kind, event.time, a, b, particles.vx[a], particles.vy[a],
+                                             particles.vx[b], particles.vy[b])
+        elif kind == EventCellCrossing.KIND:
+            record = self.RECORDS[kind].pack(kind, event.time, a, event.cell[0], event.cell[1])
+        elif kind in self.RECORDS:
+            record = self.RECORDS[kind].pack(kind, event.time, a, particles.vx[a], particles.vy[a])
+        else:
+            return
+        self.file.write(record)
+        self.records += 1
 
-    def __init__(self, ball, *args, **kwargs):
-        super(EventWallHorizontal, self).__init__(*args, **kwargs)
-        self.a = ball
+    def __iter__(self):
+        """
+        Read the records from the current position of the file, they are unpacked tuples:
+        (kind, time, a, b, vx_a, vy_a, vx_b, vy_b), (kind, time, a, vx, vy) or (kind, time, a, column, row)
+        """
+        records = self.RECORDS
+        buffer = ''
+        offset = 0
+        while True:
+            if len(buffer) - offset < 64:
+                buffer = buffer[offset:] + self.file.read(self.CHUNK)
+                offset = 0
+                if not buffer:
+                    return
+            record = records[ord(buffer[offset])]
+            if len(buffer) - offset < record.size:
+                raise ValueError('Event log is truncated')
+            yield record.unpack_from(buffer, offset)
+            offset += record.size
 
 
 class CollisionSystem(object):
-
-    def __init__(self, root, balls):
-        self.root = root
+    """
+    Event driven simulation: collisions are predicted and kept in MinPQ ordered by time,
+    the simulation jumps from one event to the next one.
+    Only the balls of the processed event are moved and predicted again, the events which
+    became outdated stay in the queue and are skipped when popped (collision counts changed).
+    Rendering is pluggable: renderer.draw(system) is called hz times per time unit.
+    The state of the balls is moved into shared Particles arrays, events refer to the balls by index.
+
+    The box is split into a uniform grid of square cells (broad phase) which are not smaller
+    than the biggest ball diameter, so a ball can hit only the balls of its own and 8 neighbouring cells.
+    When a ball crosses the border of its cell (it is an event in the queue too) it is predicted again
+    against its new neighbours, so every event costs O(balls per cell) instead of O(N).
+    cell_size defaults to ~1 ball per cell, a cell as big as the box gives brute force all pairs prediction.
+
+    Processed events can be written to EventLog and the whole state can be saved with checkpoint()
+    (on_checkpoint(system) is called every checkpoint_interval time units): restore() continues
+    the simulation from a checkpoint exactly as it would go on without the interruption,
+    replay() moves the balls through the logged events without simulating them.
+    A checkpoint remembers the position of the log at its time, so the log is replayed from any checkpoint.
+    """
+    CHECKPOINT_HEADER = struct.Struct('<4sBBIddddqq')
+    CHECKPOINT_EVENT = struct.Struct('<dBiiqqii')
+
+    def __init__(self, balls, size=CANVAS_SIZE, renderer=None, hz=1.0, cell_size=None, log=None,
+                 on_checkpoint=None, checkpoint_interval=None):
+        if on_checkpoint is not None and not checkpoint_interval > 0:
+            raise ValueError('on_checkpoint requires positive checkpoint_interval: {}'.format(checkpoint_interval))
         self.balls = balls
+        self.particles = Particles()
+        for ball in balls:
+            ball.attach(self.particles)
+        self.size = size
+        self.renderer = renderer
+        self.hz = hz
+        self.log = log
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        diameter = 2 * max(self.particles.radius) if balls else 1
+        if cell_size is None:
+            cell_size = math.sqrt(float(size[0]) * size[1] / max(len(balls), 1))
+        self.cell_size = max(cell_size, diameter)
+        self.columns = max(int(math.ceil(size[0] / self.cell_size)), 1)
+        self.rows = max(int(math.ceil(size[1] / self.cell_size)), 1)
+        # (column, row) -> set of the balls whose centers are in the cell, and the cell of every ball
+        self.cells = defaultdict(set)
+        self.cell_of = [None] * len(balls)
         self.pq = MinPQ()
-        self.time = 0
-
-    def predict(self, ball):
-        if ball:
-            for b in self.balls:
-                dt = ball.time_to_hit(b)
-                # add collision with each ball
-                event = EventBall(ball, b, self.time + dt)
-                if event.is_valid(self.time):
-                    self.pq.push(event)
-            # add walls collisions
-            self.pq.push(EventWallVertical(ball, self.time + ball.time_to_hit_v()))
-            self.pq.push(EventWallHorizontal(ball, self.time + ball.time_to_hit_h()))
-
-    def simulate(self):
-        for b in self.balls:
-            self.predict(b)
-        self.move()
-
-    def move(self):
-        if self.pq:
-            event = self.pq.pop()
-            if event.is_valid(self.time):
-                dt = event.time - self.time
-                for b in self.balls:
-                    b.move(root, dt)
-                self.time = event.time
-                if isinstance(event, EventBall):
-                    event.a.bounce_off(event.b)
-                elif isinstance(event, EventWallVertical):
-                    event.a.bounce_off_v()
-                elif isinstance(event, EventWallHorizontal):
-                    event.a.bounce_off_h()
-
-                self.predict(event.a)
-                if hasattr(event, 'b'):
-                    self.predict(event.b)
-        root.after(50, self.move)
+        self.time = 0.0
+        self.started = False
+        # position of the event log which the state corresponds to (restored or replayed system)
+        self.log_offset = None
+        # statistics: processed, cell crossing and skipped (outdated) events,
+        # wall clock time of start() and simulate()
+        self.events = 0
+        self.crossings = 0
+        self.invalid = 0
+        self.startup = 0.0
+        self.elapsed = 0.0
+
+    def _candidates(self, i):
+        """
+        Balls of the cell of ball i and its neighbouring cells
+        """
+        cells = self.cells
+        column, row = self.cell_of[i]
+        candidates = []
+        for c in xrange(column - 1, column + 2):
+            for r in xrange(row - 1, row + 2):
+                if (c, r) in cells:
+                    candidates.extend(cells[c, r])
+        return candidates
+
+    def predict(self, i):
+        """
+        Predict the collisions of ball i with the walls and the balls of neighbouring cells
+        and the time when it leaves its cell
+        """
+        now = self.time
+        particles = self.particles
+        particles.move(i, now)
+        counts = particles.count
+        pq = self.pq
+        candidates = self._candidates(i)
+        for j, dt in zip(candidates, particles.times_to_hit(i, candidates)):
+            if dt < INF:
+                pq.push(EventBall(i, j, now + dt, counts[i], counts[j]))
+        for event in self._predict_walls(i):
+            pq.push(event)
+
+    def _predict_walls(self, i):
+        """
+        Events of ball i which do not depend on the other balls: walls and cell crossing
+        """
+        now = self.time
+        particles = self.particles
+        count = particles.count[i]
+        dt = particles.time_to_hit_v(i, self.size[0])
+        if dt < INF:
+            yield EventWallVertical(i, now + dt, count)
+        dt = particles.time_to_hit_h(i, self.size[1])
+        if dt < INF:
+            yield EventWallHorizontal(i, now + dt, count)
+        dt, cell = self._time_to_cross(i)
+        if dt < INF:
+            yield EventCellCrossing(i, now + dt, count, cell)
+
+    def _time_to_cross(self, i):
+        """
+        Time (after t[i]) for ball i to cross the border of its cell and the next cell
+        """
+        column, row = self.cell_of[i]
+        size = self.cell_size
+        particles = self.particles
+        x, y, vx, vy = particles.x[i], particles.y[i], particles.vx[i], particles.vy[i]
+        dx = dy = INF
+        if vx > 0 and column + 1 < self.columns:
+            dx = ((column + 1) * size - x) / vx
+        elif vx < 0 and column > 0:
+            dx = (column * size - x) / vx
+        if vy > 0 and row + 1 < self.rows:
+            dy = ((row + 1) * size - y) / vy
+        elif vy < 0 and row > 0:
+            dy = (row * size - y) / vy
+        if dx < dy:
+            return max(dx, 0.0), (column + (1 if vx > 0 else -1), row)
+        if dy < INF:
+            return max(dy, 0.0), (column, row + (1 if vy > 0 else -1))
+        return INF, None
+
+    def cross(self, i, cell):
+        """
+        Move ball i into another cell, the events predicted before are outdated
+        """
+        old = self.cell_of[i]
+        self.cells[old].discard(i)
+        if not self.cells[old]:
+            del self.cells[old]
+        self.cells[cell].add(i)
+        self.cell_of[i] = cell
+        self.particles.count[i] += 1
+        self.crossings += 1
+
+    def _cell_of(self, x, y):
+        return (min(max(int(x / self.cell_size), 0), self.columns - 1),
+                min(max(int(y / self.cell_size), 0), self.rows - 1))
+
+    def start(self):
+        """
+        Predict all the events at once: the times of all the candidate pairs are computed in one batch
+        and the queue is built bottom-up in linear time
+        """
+        start = time.time()
+        particles = self.particles
+        n = len(particles)
+        self.cells = defaultdict(set)
+        for i in xrange(n):
+            particles.move(i, self.time)
+            self.cell_of[i] = self._cell_of(particles.x[i], particles.y[i])
+            self.cells[self.cell_of[i]].add(i)
+        first, second = [], []
+        for i in xrange(n):
+            candidates = self._candidates(i)
+            first.extend([i] * len(candidates))
+            second.extend(candidates)
+        counts = particles.count
+        now = self.time
+        events = [EventBall(i, j, now + dt, counts[i], counts[j])
+                  for i, j, dt in zip(first, second, particles.pairs_times_to_hit(first, second)) if dt < INF]
+        for i in xrange(n):
+            events.extend(self._predict_walls(i))
+        events.extend(self._service_events())
+        self.pq = MinPQ(events)
+        self.started = True
+        self.startup += time.time() - start
+
+    def _service_events(self):
+        """
+        Events which do not change the balls: redraw and checkpoint
+        """
+        if self.renderer is not None:
+            yield EventRedraw(self.time)
+        if self.on_checkpoint is not None:
+            yield EventCheckpoint(self.time + self.checkpoint_interval)
 
+    def simulate(self, until=INF, max_events=None):
+        """
+        Process the events up to the given time (or the number of events),
+        it can be called again to continue the simulation
+        """
+        if not self.started:
+            self.start()
+        pq = self.pq
+        particles = self.particles
+        counts = particles.count
+        log = self.log
+        processed = 0
+        start = time.time()
+        while pq and processed != max_events:
+            if pq.min.time > until:
+                self.time = until
+                break
+            event = pq.pop()
+            if not event.is_valid(counts):
+                self.invalid += 1
+                continue
+            self.time = event.time
+            event.resolve(self)
+            if log is not None:
+                log.write(event, particles)
+            processed += 1
+        self.events += processed
+        self.elapsed += time.time() - start
+
+    def checkpoint(self, file):
+        """
+        Write the state of the simulation into binary file: particles arrays, cells, pending valid events
+        and the position of the event log (-1 if there is no log)
+        """
+        if not self.started:
+            self.start()
+        particles = self.particles
+        counts = particles.count
+        events = [event for event in self.pq if event.KIND <= EventCellCrossing.KIND and event.is_valid(counts)]
+        log_offset = self.log.file.tell() if self.log is not None else -1
+        file.write(self.CHECKPOINT_HEADER.pack('CSCK', 2, counts.itemsize, len(particles), self.time,
+                                               self.size[0], self.size[1], self.cell_size, len(events), log_offset))
+        for name in Particles.FIELDS:
+            file.write(getattr(particles, name).tostring())
+        file.write(counts.tostring())
+        file.write(array('i', [c for cell in self.cell_of for c in cell]).tostring())
+        for event in events:
+            cell = event.cell if event.KIND == EventCellCrossing.KIND else (-1, -1)
+            file.write(self.CHECKPOINT_EVENT.pack(event.time, event.KIND,
+                                                  -1 if event.a is None else event.a,
+                                                  -1 if event.b is None else event.b,
+                                                  event.count_a, event.count_b, cell[0], cell[1]))
+
+    @classmethod
+    def restore(cls, file, renderer=None, hz=1.0, log=None, on_checkpoint=None, checkpoint_interval=None):
+        """
+        Create the system from the checkpoint, balls are new views of the restored particles
+        """
+        header = file.read(cls.CHECKPOINT_HEADER.size)
+        if len(header) < cls.CHECKPOINT_HEADER.size:
+            raise ValueError('Checkpoint is truncated')
+        (magic, version, itemsize, n, now, width, height, cell_size, pending,
+         log_offset) = cls.CHECKPOINT_HEADER.unpack(header)
+        if magic != 'CSCK' or version != 2:
+            raise ValueError('Not a collision system checkpoint')
+        state = dict()
+        for name in Particles.FIELDS:
+            state[name] = _read_array(file, 'd', n)
+        counts = _read_array(file, 'l', n)
+        if counts.itemsize != itemsize:
+            raise ValueError('Checkpoint is written on a platform with {} bytes counts'.format(itemsize))
+        cells = _read_array(file, 'i', 2 * n)
+        balls = [Ball(state['radius'][i], state['x'][i], state['y'][i], state['vx'][i], state['vy'][i],
+                      state['mass'][i]) for i in xrange(n)]
+        system = cls(balls, (width, height), renderer, hz, cell_size, log, on_checkpoint, checkpoint_interval)
+        system.particles.t[:] = state['t']
+        system.particles.count[:] = counts
+        system.time = now
+        system.log_offset = log_offset if log_offset >= 0 else None
+        for i in xrange(n):
+            system.cell_of[i] = (cells[2 * i], cells[2 * i + 1])
+            system.cells[system.cell_of[i]].add(i)
+        events = list(system._service_events())
+        record = cls.CHECKPOINT_EVENT
+        data = file.read(record.size * pending)
+        if len(data) < record.size * pending:
+            raise ValueError('Checkpoint is truncated')
+        for k in xrange(pending):
+            t, kind, a, b, count_a, count_b, column, row = record.unpack_from(data, k * record.size)
+            if kind == EventBall.KIND:
+                events.append(EventBall(a, b, t, count_a, count_b))
+            elif kind == EventWallVertical.KIND:
+                events.append(EventWallVertical(a, t, count_a))
+            elif kind == EventWallHorizontal.KIND:
+                events.append(EventWallHorizontal(a, t, count_a))
+            else:
+                events.append(EventCellCrossing(a, t, count_a, (column, row)))
+        system.pq = MinPQ(events)
+        system.started = True
+        return system
+
+    def replay(self, log, until=INF):
+        """
+        Move the balls through the events of the log (EventLog) up to the given time without predicting them.
+        The log is read from the position of the checkpoint the system is restored from
+        (or where the previous replay stopped), from the current position of the file otherwise.
+        Replayed balls are bit-for-bit the same as simulated ones. Predicted events are dropped:
+        simulate() predicts them again from the replayed state, so the physics goes on the same way
+        but predicted times may differ in the last bits, restore() a checkpoint to continue exactly.
+        Returns the number of replayed events.
+        """
+        particles = self.particles
+        move, counts, vx, vy = particles.move, particles.count, particles.vx, particles.vy
+        sizes = dict((kind, record.size) for kind, record in log.RECORDS.iteritems())
+        if self.log_offset is not None:
+            log.file.seek(self.log_offset)
+        offset = log.file.tell()
+        replayed = 0
+        for record in log:
+            kind, t = record[0], record[1]
+            if t > until:
+                break
+            offset += sizes[kind]
+            a = record[2]
+            move(a, t)
+            if kind == EventBall.KIND:
+                b = record[3]
+                move(b, t)
+                vx[a], vy[a], vx[b], vy[b] = record[4:]
+                counts[a] += 1
+                counts[b] += 1
+            elif kind == EventCellCrossing.KIND:
+                self.cross(a, record[3:])
+            else:
+                vx[a], vy[a] = record[3:]
+                counts[a] += 1
+            self.time = t
+            replayed += 1
+        if until < INF:
+            self.time = until
+        self.log_offset = offset
+        self.pq = MinPQ()
+        self.started = False
+        return replayed
 
-if __name__ == '__main__':
-    root = tk.Tk()
-    canvas = tk.Canvas(root, width=CANVAS_SIZE[0], height=CANVAS_SIZE[1], borderwidth=0, highlightthickness=0, bg="white")
-    canvas.grid()
+    @property
+    def events_per_second(self):
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    def stats(self):
+        return {
+            'balls': len(self.balls),
+            'time': self.time,
+            'events': self.events,
+            'crossings': self.crossings,
+            'invalid': self.invalid,
+            'queue': len(self.pq),
+            'startup': self.startup,
+            'elapsed': self.elapsed,
+            'events_per_second': self.events_per_second,
+        }
 
-    # create new balls
+    @property
+    def kinetic_energy(self):
+        return sum(self.particles.kinetic_energy(i) for i in xrange(len(self.particles)))
+
+
+def _read_array(file, typecode, n):
+    items = array(typecode)
+    data = file.read(items.itemsize * n)
+    if len(data) < items.itemsize * n:
+        raise ValueError('Checkpoint is truncated')
+    items.fromstring(data)
+    return items
+
+
+class TkRenderer(object):
+    """
+    Draws the balls on Tkinter canvas
+    """
+
+    def __init__(self, size=CANVAS_SIZE, delay=20, title='Bouncing balls'):
+        if tk is None:
+            raise ImportError('TkRenderer requires python-tk')
+        self.root = tk.Tk()
+        self.root.wm_title(title)
+        self.canvas = tk.Canvas(self.root, width=size[0], height=size[1], borderwidth=0, highlightthickness=0,
+                                bg='white')
+        self.canvas.grid()
+        self.delay = delay
+        # canvas ids of the balls
+        self.ids = dict()
+
+    def draw(self, system):
+        for ball in system.balls:
+            x, y = ball.position(system.time)
+            r = ball.radius
+            if ball in self.ids:
+                self.canvas.coords(self.ids[ball], x - r, y - r, x + r, y + r)
+            else:
+                self.ids[ball] = self.canvas.create_oval(x - r, y - r, x + r, y + r, width=0, fill=ball.color)
+        self.root.update()
+        self.root.after(self.delay)
+
+
+def random_balls(n, size=CANVAS_SIZE, radius=None, speed=5):
+    """
+    Returns n balls which do not overlap: every ball is placed into its own cell of a square lattice
+    """
+    side = int(math.ceil(math.sqrt(n)))
+    cell = min(size) / float(side)
+    if radius is None:
+        radius = cell / 4
+    if 2 * radius > cell:
+        raise ValueError('{} balls of radius {} do not fit into {}'.format(n, radius, size))
+    jitter = cell / 2 - radius
     balls = []
-    colors = ['green', 'black', 'blue', 'red', 'orange']
-    for b in xrange(5):
-        balls.append(Ball(canvas, color=colors.pop()))
+    for i in xrange(n):
+        row, column = divmod(i, side)
+        balls.append(Ball(radius,
+                          (column + 0.5) * cell + random.uniform(-jitter, jitter),
+                          (row + 0.5) * cell + random.uniform(-jitter, jitter),
+                          random.uniform(-speed, speed), random.uniform(-speed, speed)))
+    return balls
 
-    cs = CollisionSystem(root, balls)
-    cs.simulate()
 
-    root.wm_title("Bouncing balls")
-    root.mainloop()
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bouncing balls simulation')
+    parser.add_argument('--balls', type=int, default=20)
+    parser.add_argument('--headless', action='store_true', help='run without rendering and print statistics')
+    parser.add_argument('--time', type=float, default=100, help='simulated time of the headless run')
+    parser.add_argument('--scaling', action='store_true', help='compare per event cost of grid and all pairs')
+    parser.add_argument('--replay', action='store_true', help='check checkpoints restore and log replay')
+    args = parser.parse_args()
+
+    try:
+        CollisionSystem([], on_checkpoint=lambda system: None)
+        assert False
+    except ValueError:
+        pass
+
+    # standalone balls collide the same way as the balls of one array
+    a, b = Ball(10, 100, 100, 1, 0, 2), Ball(5, 200, 105, -1, 0, 1)
+    shared = Particles()
+    c, d = Ball(10, 100, 100, 1, 0, 2), Ball(5, 200, 105, -1, 0, 1)
+    c.attach(shared)
+    d.attach(shared)
+    assert a.time_to_hit(b) == c.time_to_hit(d) < INF
+    t = a.time_to_hit(b)
+    for ball in (a, b, c, d):
+        ball.move(t)
+    a.bounce_off(b)
+    c.bounce_off(d)
+    assert (a.vx, a.vy, b.vx, b.vy, a.count, b.count) == (c.vx, c.vy, d.vx, d.vy, c.count, d.count)
+    assert a.count == b.count == 1 and a.vx < 0 < b.vx
+
+    def state(system):
+        particles = system.particles
+        return [getattr(particles, name).tostring() for name in Particles.FIELDS + ('count',)]
+
+    if args.replay:
+        from StringIO import StringIO
+
+        log_file = StringIO()
+        checkpoints = []
+
+        def on_checkpoint(system):
+            checkpoint = StringIO()
+            system.checkpoint(checkpoint)
+            checkpoints.append(checkpoint.getvalue())
+
+        system = CollisionSystem(random_balls(args.balls), log=EventLog(log_file), on_checkpoint=on_checkpoint,
+                                 checkpoint_interval=args.time / 4)
+        initial = StringIO()
+        system.checkpoint(initial)
+        system.simulate(args.time)
+        # restart from the middle: it goes on bit-for-bit as the uninterrupted simulation
+        restored = CollisionSystem.restore(StringIO(checkpoints[1]))
+        restored.simulate(args.time)
+        assert state(restored) == state(system)
+        # replay the whole log from the initial state
+        replayed = CollisionSystem.restore(StringIO(initial.getvalue()))
+        log_file.seek(0)
+        start = time.time()
+        events = replayed.replay(EventLog(log_file))
+        elapsed = time.time() - start
+        assert state(replayed) == state(system)
+        # replay from the middle checkpoint in two steps
+        replayed = CollisionSystem.restore(StringIO(checkpoints[1]))
+        replayed.replay(EventLog(log_file), args.time * 0.6)
+        replayed.replay(EventLog(log_file))
+        assert state(replayed) == state(system)
+        print '{} events simulated in {:.3f}s, replayed in {:.3f}s ({:.0f} events/s), log {} bytes'.format(
+            events, system.elapsed, elapsed, events / elapsed, log_file.tell())
+    elif args.scaling:
+        # the same density of balls: the box grows with N
+        events = 5000
+        for n, cell_size in ((500, INF), (2000, INF), (500, None), (2000, None), (8000, None), (32000, None),
+                             (100000, None)):
+            random.seed(n)
+            size = (6 * math.sqrt(n),) * 2
+            system = CollisionSystem(random_balls(n, size), size, cell_size=cell_size)
+            system.simulate(max_events=events)
+            print '{:>6} balls {:>9}: startup {:7.3f}s, {:6.1f}us per event, {:5.2f} balls per cell'.format(
+                n, 'all pairs' if cell_size == INF else 'grid', system.startup, 1e6 * system.elapsed / events,
+                float(n) / (system.columns * system.rows))
+    elif args.headless:
+        balls = random_balls(args.balls)
+        # the grid gives the same trajectories as the all pairs prediction
+        copies = [Ball(b.radius, b.x, b.y, b.vx, b.vy) for b in balls]
+        brute = CollisionSystem(copies, cell_size=INF)
+        brute.simulate(min(args.time, 5))
+        system = CollisionSystem(balls)
+        energy = system.kinetic_energy
+        system.simulate(min(args.time, 5))
+        for a, b in zip(system.balls, brute.balls):
+            assert abs(a.position(system.time)[0] - b.position(system.time)[0]) < 1e-6
+        system.simulate(args.time)
+        assert abs(system.kinetic_energy - energy) < 1e-6 * energy
+        for ball in system.balls:
+            x, y = ball.position(system.time)
+            assert -1e-6 < x - ball.radius and x + ball.radius < system.size[0] + 1e-6
+        stats = system.stats()
+        print ', '.join('{}={}'.format(name, stats[name]) for name in sorted(stats))
+    else:
+        system = CollisionSystem(random_balls(args.balls), renderer=TkRenderer())
+        try:
+            system.simulate()
+        except tk.TclError:
+            # the window is closed
+            pass
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import deque
+
+from priority_queues.pq_api import MinPQ
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+
+class ConcurrentMinPQ(object):
+    """
+    Thread-safe min priority queue on top of MinPQ
+    Every operation takes the lock once, so push_many and pop_many move a whole batch
+    for the price of a single acquire (Queue.PriorityQueue locks and notifies on every item).
+    get() blocks until there is an item to pop.
+    """
+
+    def __init__(self, items=None):
+        self.pq = MinPQ(items)
+        self.not_empty = threading.Condition(threading.Lock())
+        # number of consumers blocked in get(), nobody is notified if there are none
+        self.waiting = 0
+
+    def push(self, item):
+        with self.not_empty:
+            self.pq.push(item)
+            if self.waiting:
+                self.not_empty.notify()
+
+    def push_many(self, items):
+        """
+        Push all the items under one lock, a batch bigger than the heap is heapified in O(N)
+        """
+        items = list(items)
+        with self.not_empty:
+            if len(items) > len(self.pq):
+                self.pq = MinPQ(self.pq.data + items)
+            else:
+                push = self.pq.push
+                for item in items:
+                    push(item)
+            if self.waiting:
+                self.not_empty.notify(len(items))
+
+    def pop(self):
+        """
+        Remove and return the min item, IndexError is raised if the queue is empty
+        """
+        with self.not_empty:
+            if not self.pq:
+                raise IndexError('Priority queue is empty')
+            return self.pq.pop()
+
+    def pop_many(self, n):
+        """
+        Remove and return up to n smallest items in ascending order under one lock
+        """
+        with self.not_empty:
+            pop = self.pq.pop
+            return [pop() for _ in xrange(min(n, len(self.pq)))]
+
+    def get(self, timeout=None):
+        """
+        Remove and return the min item, waits for producers if the queue is empty.
+        IndexError is raised if nothing is pushed within timeout seconds.
+        """
+        with self.not_empty:
+            if not self.pq:
+                self.waiting += 1
+                try:
+                    if timeout is None:
+                        while not self.pq:
+                            self.not_empty.wait()
+                    else:
+                        # another consumer may take the item after the wake-up, wait for the rest of the time
+                        deadline = time.time() + timeout
+                        while not self.pq:
+                            remaining = deadline - time.time()
+                            if remaining <= 0:
+                                raise IndexError('Priority queue is empty')
+                            self.not_empty.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            return self.pq.pop()
+
+    @property
+    def min(self):
+        with self.not_empty:
+            return self.pq.min
+
+    def __nonzero__(self):
+        return len(self.pq) > 0
+
+    def __len__(self):
+        return len(self.pq)
+
+
+class AsyncMinPQ(object):
+    """
+    Min priority queue for asyncio consumers on top of MinPQ
+    get() returns a future which is resolved with the min item as soon as there is one:
+    item = await pq.get() (or yield From(pq.get()) with trollius on Python 2).
+    Waiting consumers are served in FIFO order. The queue belongs to the event loop thread,
+    other threads push via loop.call_soon_threadsafe(pq.push_many, items).
+    """
+
+    def __init__(self, items=None, loop=None):
+        if asyncio is None:
+            raise ImportError('AsyncMinPQ requires asyncio (or trollius on Python 2)')
+        self.pq = MinPQ(items)
+        self.loop = loop
+        self.getters = deque()
+
+    def push(self, item):
+        self.pq.push(item)
+        self._wakeup()
+
+    def push_many(self, items):
+        push = self.pq.push
+        for item in items:
+            push(item)
+        self._wakeup()
+
+    def pop(self):
+        """
+        Remove and return the min item without waiting, IndexError is raised if the queue is empty
+        """
+        if not self.pq:
+            raise IndexError('Priority queue is empty')
+        return self.pq.pop()
+
+    def get(self):
+        """
+        Returns a future of the min item
+        """
+        future = asyncio.Future(loop=self.loop)
+        if self.pq:
+            future.set_result(self.pq.pop())
+        else:
+            self.getters.append(future)
+        return future
+
+    def _wakeup(self):
+        """
+        Hand the smallest items over to the waiting consumers, cancelled ones are skipped
+        """
+        getters, pq = self.getters, self.pq
+        while getters and pq:
+            getter = getters.popleft()
+            if not getter.done():
+                getter.set_result(pq.pop())
+
+    @property
+    def min(self):
+        return self.pq.min
+
+    def __nonzero__(self):
+        return len(self.pq) > 0
+
+    def __len__(self):
+        return len(self.pq)
+
+
+if __name__ == '__main__':
+    import random
+    from Queue import PriorityQueue
+
+    items = [random.randint(0, 1000) for _ in xrange(1000)]
+    pq = ConcurrentMinPQ(items[:10])
+    pq.push_many(items[10:500])
+    for item in items[500:]:
+        pq.push(item)
+    assert pq.pop_many(10) == sorted(items)[:10]
+    assert [pq.pop() for _ in xrange(490)] + pq.pop_many(1000) == sorted(items)[10:]
+    try:
+        pq.get(timeout=0.01)
+        assert False
+    except IndexError:
+        pass
+
+    # a consumer which loses the item to another one keeps waiting until its timeout
+    pq = ConcurrentMinPQ()
+    results = []
+
+    def consume():
+        started = time.time()
+        try:
+            results.append(pq.get(timeout=0.5))
+        except IndexError:
+            results.append(time.time() - started)
+
+    consumers = [threading.Thread(target=consume) for _ in xrange(2)]
+    for consumer in consumers:
+        consumer.start()
+    time.sleep(0.05)
+    pq.push(1)
+    time.sleep(0.05)
+    pq.push(2)
+    for consumer in consumers:
+        consumer.join()
+    assert sorted(results) == [1, 2]
+    # a wake-up without an item does not end the wait early
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    time.sleep(0.05)
+    with pq.not_empty:
+        pq.not_empty.notify_all()
+    consumer.join()
+    assert results[-1] >= 0.5
+
+    if asyncio is not None:
+        loop = asyncio.new_event_loop()
+        apq = AsyncMinPQ(loop=loop)
+        futures = [apq.get() for _ in xrange(3)]
+        futures[1].cancel()
+        loop.call_soon(apq.push_many, [5, 3, 9, 1])
+        loop.run_until_complete(futures[2])
+        assert [futures[0].result(), futures[2].result()] == [1, 3]
+        assert [loop.run_until_complete(apq.get()) for _ in xrange(2)] == [5, 9]
+        loop.close()
+    else:
+        print 'asyncio is not available, AsyncMinPQ is not checked'
+
+    # contention: producers push 200k items in total while one consumer drains them
+    n = 200000
+    batch = 100
+    items = [random.random() for _ in xrange(n)]
+
+    def run(producers, produce, consume):
+        share = n / producers
+        threads = [threading.Thread(target=produce, args=(items[i * share:(i + 1) * share],))
+                   for i in xrange(producers)]
+        consumer = threading.Thread(target=consume, args=(share * producers,))
+        start = time.time()
+        for thread in threads + [consumer]:
+            thread.start()
+        for thread in threads + [consumer]:
+            thread.join()
+        return time.time() - start
+
+    for producers in (1, 4, 16):
+        queue = PriorityQueue()
+
+        def produce(chunk):
+            for item in chunk:
+                queue.put(item)
+
+        def consume(count):
+            for _ in xrange(count):
+                queue.get()
+
+        elapsed = run(producers, produce, consume)
+        print '{:>2} producers   PriorityQueue put/get: {:.3f}s'.format(producers, elapsed)
+
+        cpq = ConcurrentMinPQ()
+
+        def produce(chunk):
+            for item in chunk:
+                cpq.push(item)
+
+        def consume(count):
+            for _ in xrange(count):
+                cpq.get()
+
+        elapsed = run(producers, produce, consume)
+        print '{:>2} producers ConcurrentMinPQ push/get: {:.3f}s'.format(producers, elapsed)
+
+        def produce(chunk):
+            for i in xrange(0, len(chunk), batch):
+                cpq.push_many(chunk[i:i + batch])
+
+        def consume(count):
+            while count > 0:
+                popped = cpq.pop_many(batch)
+                if not popped:
+                    popped = [cpq.get()]
+                count -= len(popped)
+
+        elapsed = run(producers, produce, consume)
+        print '{:>2} producers ConcurrentMinPQ push_many/pop_many({}): {:.3f}s'.format(producers, batch, elapsed)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+
+class DaryHeap(object):
+    """
+    Min oriented d-ary heap of (priority, id) entries
+    Priorities are floats kept in compact array('d') and ids are integers kept in the parallel array('l'),
+    so there are no per entry objects: an entry takes 16 bytes instead of ~100 for a (priority, id) tuple
+    in MinPQ, and every comparison is a comparison of two floats.
+    Bigger arity makes the heap lower: push gets cheaper (log_d N levels),
+    pop compares d children on every level (with min() over a slice for d > 2).
+    It is a memory optimization: CPython boxes a float on every array read, so it runs about
+    as fast as MinPQ with arity 8 and slower with smaller arities.
+    """
+
+    def __init__(self, arity=4, entries=None):
+        if arity < 2:
+            raise ValueError('Arity must be at least 2')
+        self.arity = arity
+        self.priorities = array('d')
+        self.ids = array('l')
+        if entries is not None:
+            self.heapify(entries)
+
+    def heapify(self, entries):
+        """
+        Add (priority, id) entries at once and restore the heap bottom-up, it runs O(N)
+        """
+        for priority, id in entries:
+            self.priorities.append(priority)
+            self.ids.append(id)
+        p, ids = self.priorities, self.ids
+        for k in xrange((len(p) - 2) / self.arity, -1, -1):
+            self._sift_down(k, p[k], ids[k])
+
+    def push(self, priority, id):
+        """
+        Move parents down until the right place (hole) for the entry is found
+        """
+        p, ids, d = self.priorities, self.ids, self.arity
+        p.append(priority)
+        ids.append(id)
+        k = len(p) - 1
+        while k:
+            parent = (k - 1) / d
+            above = p[parent]
+            if above <= priority:
+                break
+            p[k] = above
+            ids[k] = ids[parent]
+            k = parent
+        p[k] = priority
+        ids[k] = id
+
+    def pop(self):
+        """
+        Remove and return the (priority, id) entry with the smallest priority
+        """
+        p, ids = self.priorities, self.ids
+        top = p[0], ids[0]
+        priority = p.pop()
+        id = ids.pop()
+        if p:
+            self._sift_down(0, priority, id)
+        return top
+
+    @property
+    def min(self):
+        return self.priorities[0], self.ids[0]
+
+    def _sift_down(self, k, priority, id):
+        """
+        Move the smallest children up until the right place (hole) for the entry is found
+        """
+        p, ids, d = self.priorities, self.ids, self.arity
+        n = len(p)
+        first = k * d + 1
+        while first < n:
+            # find the smallest child
+            if d == 2:
+                child = first
+                smallest = p[first]
+                if first + 1 < n and p[first + 1] < smallest:
+                    child += 1
+                    smallest = p[child]
+            else:
+                children = p[first:first + d]
+                smallest = min(children)
+                child = first + children.index(smallest)
+            if smallest >= priority:
+                break
+            p[k] = smallest
+            ids[k] = ids[child]
+            k = child
+            first = k * d + 1
+        p[k] = priority
+        ids[k] = id
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+    def __len__(self):
+        return len(self.priorities)
+
+    def __iter__(self):
+        return iter(zip(self.priorities, self.ids))
+
+
+if __name__ == '__main__':
+    import random
+    import sys
+    import time
+    from priority_queues.pq_api import MinPQ
+
+    entries = [(random.random(), i) for i in xrange(1000)]
+    for arity in (2, 4, 8):
+        heap = DaryHeap(arity)
+        for priority, id in entries:
+            heap.push(priority, id)
+        assert [heap.pop() for _ in xrange(len(entries))] == sorted(entries)
+        heap = DaryHeap(arity, entries)
+        assert [heap.pop() for _ in xrange(len(entries))] == sorted(entries)
+
+    # both heaps get the same entries and their methods are called directly
+    def push_heavy(pq, push, pop, unpack):
+        # 3 pushes for every pop
+        for i, entry in enumerate(entries):
+            if unpack:
+                push(*entry)
+            else:
+                push(entry)
+            if i % 3 == 2:
+                pop()
+
+    def pop_heavy(pq, push, pop, unpack):
+        if unpack:
+            for priority, id in entries:
+                push(priority, id)
+        else:
+            for entry in entries:
+                push(entry)
+        while pq:
+            pop()
+
+    entries = [(random.random(), i) for i in xrange(200000)]
+    for name, mix in (('push-heavy', push_heavy), ('pop-heavy', pop_heavy)):
+        pq = MinPQ()
+        start = time.time()
+        mix(pq, pq.push, pq.pop, False)
+        print '{:>10} MinPQ: {:.3f}s'.format(name, time.time() - start)
+        for arity in (2, 4, 8):
+            heap = DaryHeap(arity)
+            start = time.time()
+            mix(heap, heap.push, heap.pop, True)
+            print '{:>10} DaryHeap({}): {:.3f}s'.format(name, arity, time.time() - start)
+
+    pq = MinPQ(entries)
+    heap = DaryHeap(4, entries)
+    # the list, the tuples and the floats, the ids are shared with the entries
+    memory = sys.getsizeof(pq.data) + sum(sys.getsizeof(entry) + sys.getsizeof(entry[0]) for entry in pq.data)
+    print 'memory: MinPQ ~{:.1f}MB, DaryHeap ~{:.1f}MB'.format(
+        memory / 1e6, (heap.priorities.itemsize + heap.ids.itemsize) * len(heap) / 1e6)
@@ -1,39 +1,130 @@
 # -*- coding: utf-8 -*-
+from sorting.decorate import decorated_sort
 
 
-def heap_sort(items):
+def heap_sort(items, lo=0, hi=None, key=None, reverse=False):
     """
     Heap sort using binary heap
+    Sorts the whole list or only the range lo..hi (inclusive) if it's given
     """
-    n = len(items)
-
-    def _sink(index, n):
-        """
-        Sink item down to the bottom until it is in the right place in the heap
-        """
-        while index * 2 + 1 < n:
-            j = index * 2 + 1
-            # choose the biggest child (left or right)
-            if j + 1 < n and items[j + 1] > items[j]:
-                # right child is bigger than left
-                j += 1
-            if items[index] < items[j]:
-                # exchange item with the biggest child
-                items[index], items[j] = items[j], items[index]
-                index = j
-            else:
-                break
+    if key is not None or reverse:
+        decorated_sort(items, heap_sort, key, reverse, lo, hi)
+        return
+    if hi is None:
+        hi = len(items) - 1
+    n = hi - lo + 1
 
     # heapify the list: build a valid binary heap inplace
     for i in xrange(n / 2, -1, -1):
-        _sink(i, n)
+        _sink(items, lo, i, n)
 
     # sort list by exchanging max element with the last
     while n > 0:
-        items[0], items[n - 1] = items[n - 1], items[0]
+        items[lo], items[lo + n - 1] = items[lo + n - 1], items[lo]
         n -= 1
         # "sink" the first element in the right place
-        _sink(0, n)
+        _sink(items, lo, 0, n)
+
+
+def _sink(items, lo, index, n):
+    """
+    Sink item down to the bottom until it is in the right place in the heap
+    Heap of size n starts at lo, heap indexes are relative to lo
+    """
+    while index * 2 + 1 < n:
+        j = index * 2 + 1
+        # choose the biggest child (left or right)
+        if j + 1 < n and items[lo + j + 1] > items[lo + j]:
+            # right child is bigger than left
+            j += 1
+        if items[lo + index] < items[lo + j]:
+            # exchange item with the biggest child
+            items[lo + index], items[lo + j] = items[lo + j], items[lo + index]
+            index = j
+        else:
+            break
+
+
+def heap_sort_bottom_up(items, lo=0, hi=None, key=None, reverse=False, partial=None):
+    """
+    Heap sort with bottom-up (Floyd) sift-down, it needs ~NlogN comparisons instead of ~2NlogN
+    Items are moved into the hole instead of being swapped and sorted inplace with O(1) extra memory.
+    Keys are computed once into the parallel list, so key=... costs N extra references.
+    partial=k stops after k maxima are extracted: only k items get their final positions
+    (the largest ones at the end of the range, or at the beginning if reverse is True).
+    """
+    if hi is None:
+        hi = len(items) - 1
+    n = hi - lo + 1
+    if n < 2:
+        return
+    count = n - 1 if partial is None else min(partial, n - 1)
+    if key is None:
+        for i in xrange(n / 2 - 1, -1, -1):
+            _sift_floyd(items, lo, i, n, items[lo + i])
+        for end in xrange(n - 1, n - 1 - count, -1):
+            item = items[lo + end]
+            items[lo + end] = items[lo]
+            _sift_floyd(items, lo, 0, end, item)
+    else:
+        keys = [key(items[i]) for i in xrange(lo, hi + 1)]
+        for i in xrange(n / 2 - 1, -1, -1):
+            _sift_floyd_keyed(items, keys, lo, i, n, items[lo + i], keys[i])
+        for end in xrange(n - 1, n - 1 - count, -1):
+            item, k = items[lo + end], keys[end]
+            items[lo + end], keys[end] = items[lo], keys[0]
+            _sift_floyd_keyed(items, keys, lo, 0, end, item, k)
+    if reverse:
+        while lo < hi:
+            items[lo], items[hi] = items[hi], items[lo]
+            lo += 1
+            hi -= 1
+
+
+def _sift_floyd(items, lo, index, n, item):
+    """
+    Put item into the heap position index: the hole goes down to the leaf through the biggest children
+    (one comparison per level) and then item goes up from the leaf, it is usually one or two levels
+    """
+    start = index
+    child = index * 2 + 1
+    while child < n:
+        if child + 1 < n and items[lo + child] < items[lo + child + 1]:
+            child += 1
+        items[lo + index] = items[lo + child]
+        index = child
+        child = index * 2 + 1
+    while index > start:
+        parent = (index - 1) / 2
+        if not items[lo + parent] < item:
+            break
+        items[lo + index] = items[lo + parent]
+        index = parent
+    items[lo + index] = item
+
+
+def _sift_floyd_keyed(items, keys, lo, index, n, item, key):
+    """
+    The same as _sift_floyd, but keys are compared and moved along with items
+    """
+    start = index
+    child = index * 2 + 1
+    while child < n:
+        if child + 1 < n and keys[child] < keys[child + 1]:
+            child += 1
+        items[lo + index] = items[lo + child]
+        keys[index] = keys[child]
+        index = child
+        child = index * 2 + 1
+    while index > start:
+        parent = (index - 1) / 2
+        if not keys[parent] < key:
+            break
+        items[lo + index] = items[lo + parent]
+        keys[index] = keys[parent]
+        index = parent
+    items[lo + index] = item
+    keys[index] = key
 
 
 if __name__ == '__main__':
@@ -43,4 +134,39 @@ if __name__ == '__main__':
     items = range(10)
     random.shuffle(items)
     heap_sort(items)
-    assert is_sorted(items)
\ No newline at end of file
+    assert is_sorted(items)
+    items = range(100)
+    random.shuffle(items)
+    heap_sort(items, 20, 59)
+    assert is_sorted(items[20:60])
+
+    data = [random.randint(0, 1000) for _ in xrange(1000)]
+    for key in (None, lambda x: -x):
+        for reverse in (False, True):
+            expected = sorted(data, key=key, reverse=reverse)
+            items = data[:]
+            heap_sort_bottom_up(items, key=key, reverse=reverse)
+            assert items == expected
+            items = data[:]
+            heap_sort_bottom_up(items, key=key, reverse=reverse, partial=10)
+            if reverse:
+                assert items[:10] == expected[:10]
+            else:
+                assert items[-10:] == expected[-10:]
+            assert sorted(items) == sorted(data)
+    items = data[:]
+    heap_sort_bottom_up(items, 100, 899)
+    assert items[100:900] == sorted(data[100:900]) and items[:100] == data[:100]
+
+    import time
+    from sorting.instrument import profile
+
+    data = [random.random() for _ in xrange(200000)]
+    for name, sort in (('heap_sort', heap_sort), ('heap_sort_bottom_up', heap_sort_bottom_up),
+                       ('heap_sort_bottom_up(partial=100)', lambda items: heap_sort_bottom_up(items, partial=100))):
+        items = data[:]
+        start = time.time()
+        sort(items)
+        elapsed = time.time() - start
+        stats = profile(sort, data[:20000])
+        print '{:>32}: {:.3f}s, {} comparisons for 20k items'.format(name, elapsed, stats.comparisons)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+
+class PairingHeap(object):
+    """
+    Min oriented pairing heap (Fredman, Sedgewick, Sleator, Tarjan 1986)
+    The heap is a tree where every node keeps the list of its children (child and next pointers).
+    push and meld are O(1), pop is amortized O(logN), decrease_key is amortized o(logN).
+    increase_key cuts the node and melds its children back, it is amortized O(logN).
+    push returns a handle (node) which is used to change the key or delete the item later.
+    It can be used instead of MinPQ: push, pop, min, len() and bool() are the same.
+    """
+
+    class Node(object):
+        """
+        A node in the pairing heap: the first child, the next sibling
+        and the previous sibling (or the parent for the first child)
+        """
+        __slots__ = ('item', 'child', 'next', 'prev')
+
+        def __init__(self, item):
+            self.item = item
+            self.child = None
+            self.next = None
+            self.prev = None
+
+        def __repr__(self):
+            return 'Node({!r})'.format(self.item)
+
+    def __init__(self, items=None):
+        self.root = None
+        self.n = 0
+        if items is not None:
+            for item in items:
+                self.push(item)
+
+    def push(self, item):
+        node = self.Node(item)
+        self.root = self._link(self.root, node)
+        self.n += 1
+        return node
+
+    def pop(self):
+        root = self.root
+        if root is None:
+            raise IndexError('Pairing heap is empty')
+        self.root = self._merge_pairs(root.child)
+        self.n -= 1
+        root.child = None
+        return root.item
+
+    def meld(self, other):
+        """
+        Move all the items of other pairing heap into this one, it runs O(1)
+        """
+        self.root = self._link(self.root, other.root)
+        self.n += other.n
+        other.root = None
+        other.n = 0
+
+    def decrease_key(self, node, item):
+        """
+        Replace item of the node with the smaller one
+        """
+        if node.item < item:
+            raise ValueError('Item {!r} is greater than the current one'.format(item))
+        node.item = item
+        if node is not self.root:
+            self._cut(node)
+            self.root = self._link(self.root, node)
+
+    def increase_key(self, node, item):
+        """
+        Replace item of the node with the bigger one
+        """
+        if item < node.item:
+            raise ValueError('Item {!r} is less than the current one'.format(item))
+        node.item = item
+        children = self._merge_pairs(node.child)
+        node.child = None
+        if node is self.root:
+            self.root = self._link(children, node)
+        else:
+            self._cut(node)
+            self.root = self._link(self._link(self.root, node), children)
+
+    def delete(self, node):
+        """
+        Remove the node from the heap
+        """
+        if node is self.root:
+            self.pop()
+            return
+        self._cut(node)
+        self.root = self._link(self.root, self._merge_pairs(node.child))
+        node.child = None
+        self.n -= 1
+
+    @property
+    def min(self):
+        return self.root.item
+
+    @staticmethod
+    def _link(a, b):
+        """
+        Make the root with the bigger item the first child of the other root
+        """
+        if a is None:
+            return b
+        if b is None:
+            return a
+        if b.item < a.item:
+            a, b = b, a
+        b.prev = a
+        b.next = a.child
+        if a.child is not None:
+            a.child.prev = b
+        a.child = b
+        return a
+
+    @staticmethod
+    def _cut(node):
+        """
+        Detach the node (with its subtree) from its parent and siblings
+        """
+        if node.prev.child is node:
+            node.prev.child = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+        node.next = None
+        node.prev = None
+
+    def _merge_pairs(self, first):
+        """
+        Two pass merge of the siblings list: link pairs from left to right
+        and then link the results from right to left
+        """
+        pairs = []
+        node = first
+        while node is not None:
+            a = node
+            b = node.next
+            node = b.next if b is not None else None
+            a.next = a.prev = None
+            if b is not None:
+                b.next = b.prev = None
+            pairs.append(self._link(a, b))
+        root = None
+        for heap in reversed(pairs):
+            root = self._link(heap, root)
+        if root is not None:
+            root.prev = root.next = None
+        return root
+
+    def __nonzero__(self):
+        return self.n > 0
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            yield node.item
+            if node.next is not None:
+                stack.append(node.next)
+            if node.child is not None:
+                stack.append(node.child)
+
+
+class IndexPairingHeap(object):
+    """
+    Indexed min priority queue on top of the pairing heap.
+    It can be used instead of IndexMinPQ: indexes are mapped to pairing heap handles.
+    """
+
+    def __init__(self):
+        self.heap = PairingHeap()
+        self.nodes = dict()
+
+    def insert(self, index, key):
+        if index in self.nodes:
+            raise ValueError('Index {} is already in the priority queue'.format(index))
+        self.nodes[index] = self.heap.push((key, index))
+
+    def pop(self):
+        """
+        Remove the min key and return its index
+        """
+        key, index = self.heap.pop()
+        del self.nodes[index]
+        return index
+
+    def decrease_key(self, index, key):
+        node = self._node(index)
+        if not key < node.item[0]:
+            raise ValueError('Key {!r} is not less than the current one'.format(key))
+        self.heap.decrease_key(node, (key, index))
+
+    def increase_key(self, index, key):
+        node = self._node(index)
+        if not key > node.item[0]:
+            raise ValueError('Key {!r} is not greater than the current one'.format(key))
+        self.heap.increase_key(node, (key, index))
+
+    def change_key(self, index, key):
+        current = self.key_of(index)
+        if key < current:
+            self.decrease_key(index, key)
+        elif current < key:
+            self.increase_key(index, key)
+
+    def delete(self, index):
+        self.heap.delete(self._node(index))
+        del self.nodes[index]
+
+    def meld(self, other):
+        """
+        Move all the keys of other queue into this one, indexes must not intersect
+        """
+        self.heap.meld(other.heap)
+        self.nodes.update(other.nodes)
+        other.nodes = dict()
+
+    def key_of(self, index):
+        return self._node(index).item[0]
+
+    def contains(self, index):
+        return index in self.nodes
+
+    def _node(self, index):
+        try:
+            return self.nodes[index]
+        except KeyError:
+            raise KeyError(repr(index))
+
+    @property
+    def min_index(self):
+        return self.heap.min[1]
+
+    @property
+    def min_key(self):
+        return self.heap.min[0]
+
+    def __contains__(self, index):
+        return self.contains(index)
+
+    def __nonzero__(self):
+        return len(self.heap) > 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+
+if __name__ == '__main__':
+    import random
+
+    items = [random.randint(0, 1000) for _ in xrange(1000)]
+    # shards are melded into one heap
+    heap = PairingHeap(items[:500])
+    shard = PairingHeap(items[500:])
+    heap.meld(shard)
+    assert len(heap) == 1000 and not shard
+    handles = [heap.push(random.randint(0, 1000)) for _ in xrange(100)]
+    for handle in handles[::2]:
+        heap.decrease_key(handle, handle.item - 500)
+    for handle in handles[1::4]:
+        heap.delete(handle)
+    expected = sorted(items + [h.item for i, h in enumerate(handles) if i % 4 != 1])
+    assert sorted(heap) == expected
+    assert [heap.pop() for _ in xrange(len(heap))] == expected
+
+    # random key changes against IndexMinPQ
+    from priority_queues.pq_api import IndexMinPQ
+    pq, expected = IndexPairingHeap(), IndexMinPQ()
+    for i in xrange(200):
+        key = random.randint(0, 1000)
+        pq.insert(i, key)
+        expected.insert(i, key)
+    for _ in xrange(2000):
+        i = random.randrange(200)
+        key = pq.key_of(i) + random.randint(1, 100)
+        if random.random() < 0.5:
+            pq.increase_key(i, key)
+            expected.increase_key(i, key)
+        else:
+            key = random.randint(0, 1000)
+            pq.change_key(i, key)
+            expected.change_key(i, key)
+        if random.random() < 0.1:
+            assert pq.min_key == expected.min_key
+    order = []
+    while pq:
+        key = pq.min_key
+        order.append((key, pq.pop()))
+    assert order == sorted((expected.key_of(i), i) for i in expected)
+
+    # the same MST and shortest paths as with MinPQ and IndexMinPQ
+    from graphs.minimum_spanning_trees.mst import KruskalMST
+    from graphs.minimum_spanning_trees.weighted_graph_api import WeightedGraphAPI, Edge
+    from graphs.shortest_paths.shortest_paths import DijkstraSP
+    from graphs.shortest_paths.weighted_directed_graph_api import WeightedDigraphAPI, DirectedEdge
+
+    graph = WeightedGraphAPI()
+    digraph = WeightedDigraphAPI()
+    for _ in xrange(300):
+        v, w, weight = random.randint(0, 50), random.randint(0, 50), random.random()
+        graph.add_edge(Edge(v, w, weight))
+        digraph.add_edge(DirectedEdge(v, w, weight))
+    assert KruskalMST(graph, PairingHeap()).weight == KruskalMST(graph).weight
+    assert DijkstraSP(digraph, 0, IndexPairingHeap()).dist_to == DijkstraSP(digraph, 0).dist_to
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from abc import ABCMeta, abstractmethod
 
 
 class UnorderedMaxPQ(object):
@@ -36,34 +37,72 @@ class UnorderedMaxPQ(object):
 class MaxPQ(object):
     """
     Max oriented priority queue with binary heap data structure
+    Items are moved into the hole instead of being swapped pairwise and only < is used to compare them.
     """
-    def __init__(self):
-        self.data = []
+    def __init__(self, items=None):
+        self.data = list(items) if items is not None else []
+        # build the heap bottom-up, it runs O(N)
+        for k in xrange(len(self.data) / 2 - 1, -1, -1):
+            self._sink(k)
 
     def push(self, item):
         self.data.append(item)
-        self._swim(len(self) - 1)
+        self._swim(len(self.data) - 1)
 
     def _swim(self, k):
-        while k > 0 and self.data[k] > self.data[k / 2]:
-            self.data[k], self.data[k / 2] = self.data[k / 2], self.data[k]
-            k /= 2
+        data = self.data
+        item = data[k]
+        while k > 0:
+            parent = (k - 1) / 2
+            if not data[parent] < item:
+                break
+            data[k] = data[parent]
+            k = parent
+        data[k] = item
 
     def _sink(self, k):
-        while k * 2 + 1 < len(self):
-            j = k * 2 + 1
-            if j + 1 < len(self) and self.data[j] < self.data[j + 1]:
-                j += 1
-            if self.data[k] >= self.data[j]:
+        data = self.data
+        n = len(data)
+        item = data[k]
+        child = k * 2 + 1
+        while child < n:
+            # choose the biggest child
+            if child + 1 < n and data[child] < data[child + 1]:
+                child += 1
+            if not item < data[child]:
                 break
-            else:
-                self.data[k], self.data[j] = self.data[j], self.data[k]
-            k = j
+            data[k] = data[child]
+            k = child
+            child = k * 2 + 1
+        data[k] = item
 
     def pop(self):
-        max = self.data[0]
-        self.data[0], self.data[len(self) - 1] = self.data[len(self) - 1], self.data[0]
-        self.data.pop()
+        data = self.data
+        last = data.pop()
+        if not data:
+            return last
+        max = data[0]
+        data[0] = last
+        self._sink(0)
+        return max
+
+    def pushpop(self, item):
+        """
+        Push item and pop the max one, faster than push() followed by pop()
+        """
+        data = self.data
+        if data and item < data[0]:
+            item, data[0] = data[0], item
+            self._sink(0)
+        return item
+
+    def replace(self, item):
+        """
+        Pop the max item and push the new one, faster than pop() followed by push()
+        """
+        data = self.data
+        max = data[0]
+        data[0] = item
         self._sink(0)
         return max
 
@@ -72,7 +111,7 @@ class MaxPQ(object):
         return self.data[0]
 
     def __nonzero__(self):
-        return len(self) > 0
+        return len(self.data) > 0
 
     def __len__(self):
         return len(self.data)
@@ -84,34 +123,72 @@ class MaxPQ(object):
 class MinPQ(object):
     """
     Min oriented priority queue with binary heap data structure
+    Items are moved into the hole instead of being swapped pairwise and only < is used to compare them.
     """
-    def __init__(self):
-        self.data = []
+    def __init__(self, items=None):
+        self.data = list(items) if items is not None else []
+        # build the heap bottom-up, it runs O(N)
+        for k in xrange(len(self.data) / 2 - 1, -1, -1):
+            self._sink(k)
 
     def push(self, item):
         self.data.append(item)
-        self._swim(len(self) - 1)
+        self._swim(len(self.data) - 1)
 
     def _swim(self, k):
-        while k > 0 and self.data[k] < self.data[k / 2]:
-            self.data[k], self.data[k / 2] = self.data[k / 2], self.data[k]
-            k /= 2
+        data = self.data
+        item = data[k]
+        while k > 0:
+            parent = (k - 1) / 2
+            if not item < data[parent]:
+                break
+            data[k] = data[parent]
+            k = parent
+        data[k] = item
 
     def _sink(self, k):
-        while k * 2 + 1 < len(self):
-            j = k * 2 + 1
-            if j + 1 < len(self) and self.data[j + 1] < self.data[j]:
-                j += 1
-            if self.data[k] <= self.data[j]:
+        data = self.data
+        n = len(data)
+        item = data[k]
+        child = k * 2 + 1
+        while child < n:
+            # choose the smallest child
+            if child + 1 < n and data[child + 1] < data[child]:
+                child += 1
+            if not data[child] < item:
                 break
-            else:
-                self.data[k], self.data[j] = self.data[j], self.data[k]
-            k = j
+            data[k] = data[child]
+            k = child
+            child = k * 2 + 1
+        data[k] = item
 
     def pop(self):
-        min = self.data[0]
-        self.data[0], self.data[len(self) - 1] = self.data[len(self) - 1], self.data[0]
-        self.data.pop()
+        data = self.data
+        last = data.pop()
+        if not data:
+            return last
+        min = data[0]
+        data[0] = last
+        self._sink(0)
+        return min
+
+    def pushpop(self, item):
+        """
+        Push item and pop the min one, faster than push() followed by pop()
+        """
+        data = self.data
+        if data and data[0] < item:
+            item, data[0] = data[0], item
+            self._sink(0)
+        return item
+
+    def replace(self, item):
+        """
+        Pop the min item and push the new one, faster than pop() followed by push()
+        """
+        data = self.data
+        min = data[0]
+        data[0] = item
         self._sink(0)
         return min
 
@@ -120,10 +197,280 @@ class MinPQ(object):
         return self.data[0]
 
     def __nonzero__(self):
-        return len(self) > 0
+        return len(self.data) > 0
 
     def __len__(self):
         return len(self.data)
 
     def __iter__(self):
-        return iter(self.data)
\ No newline at end of file
+        return iter(self.data)
+
+
+class IndexPQBase(object):
+    """
+    Base class for indexed priority queues with binary heap data structure
+    Every key is associated with an integer index which is used to change or delete the key later.
+    The heap is kept in flat lists instead of per item objects:
+    pq (heap position -> index), qp (index -> heap position or -1) and keys (index -> key).
+    Lists grow when a bigger index is inserted. All the operations run O(logN).
+    See http://algs4.cs.princeton.edu/24pq/IndexMinPQ.java.html
+    """
+    __metaclass__ = ABCMeta
+
+    def __init__(self, capacity=0):
+        self.pq = []
+        self.qp = [-1] * capacity
+        self.keys = [None] * capacity
+
+    @abstractmethod
+    def _less(self, key1, key2):
+        """
+        True if key1 must be closer to the top of the heap than key2
+        """
+        pass
+
+    def insert(self, index, key):
+        if index < 0:
+            raise IndexError('Index must not be negative: {}'.format(index))
+        if index >= len(self.qp):
+            self.qp.extend([-1] * (index + 1 - len(self.qp)))
+            self.keys.extend([None] * (index + 1 - len(self.keys)))
+        elif self.qp[index] != -1:
+            raise ValueError('Index {} is already in the priority queue'.format(index))
+        self.pq.append(index)
+        self.qp[index] = len(self.pq) - 1
+        self.keys[index] = key
+        self._swim(len(self.pq) - 1)
+
+    def pop(self):
+        """
+        Remove the top key and return its index
+        """
+        index = self.pq[0]
+        self.delete(index)
+        return index
+
+    def delete(self, index):
+        """
+        Remove the key associated with index
+        """
+        position = self._position(index)
+        last = len(self.pq) - 1
+        if position != last:
+            self._exchange(position, last)
+        self.pq.pop()
+        self.qp[index] = -1
+        self.keys[index] = None
+        if position != last:
+            self._swim(position)
+            self._sink(position)
+
+    def change_key(self, index, key):
+        """
+        Change the key associated with index
+        """
+        position = self._position(index)
+        self.keys[index] = key
+        self._swim(position)
+        self._sink(position)
+
+    def decrease_key(self, index, key):
+        """
+        Change the key associated with index to the smaller one
+        """
+        if not key < self.key_of(index):
+            raise ValueError('Key {!r} is not less than the current one'.format(key))
+        self.change_key(index, key)
+
+    def increase_key(self, index, key):
+        """
+        Change the key associated with index to the bigger one
+        """
+        if not key > self.key_of(index):
+            raise ValueError('Key {!r} is not greater than the current one'.format(key))
+        self.change_key(index, key)
+
+    def key_of(self, index):
+        self._position(index)
+        return self.keys[index]
+
+    def contains(self, index):
+        return 0 <= index < len(self.qp) and self.qp[index] != -1
+
+    def _position(self, index):
+        if not self.contains(index):
+            raise KeyError(repr(index))
+        return self.qp[index]
+
+    def _exchange(self, i, j):
+        pq = self.pq
+        pq[i], pq[j] = pq[j], pq[i]
+        self.qp[pq[i]] = i
+        self.qp[pq[j]] = j
+
+    def _swim(self, k):
+        keys, pq = self.keys, self.pq
+        while k > 0 and self._less(keys[pq[k]], keys[pq[(k - 1) / 2]]):
+            self._exchange(k, (k - 1) / 2)
+            k = (k - 1) / 2
+
+    def _sink(self, k):
+        keys, pq = self.keys, self.pq
+        n = len(pq)
+        while k * 2 + 1 < n:
+            j = k * 2 + 1
+            if j + 1 < n and self._less(keys[pq[j + 1]], keys[pq[j]]):
+                j += 1
+            if not self._less(keys[pq[j]], keys[pq[k]]):
+                break
+            self._exchange(k, j)
+            k = j
+
+    def __contains__(self, index):
+        return self.contains(index)
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+    def __len__(self):
+        return len(self.pq)
+
+    def __iter__(self):
+        return iter(self.pq)
+
+
+class IndexMinPQ(IndexPQBase):
+    """
+    Indexed min oriented priority queue
+    """
+
+    def _less(self, key1, key2):
+        return key1 < key2
+
+    @property
+    def min_index(self):
+        return self.pq[0]
+
+    @property
+    def min_key(self):
+        return self.keys[self.pq[0]]
+
+
+class IndexMaxPQ(IndexPQBase):
+    """
+    Indexed max oriented priority queue
+    """
+
+    def _less(self, key1, key2):
+        return key1 > key2
+
+    @property
+    def max_index(self):
+        return self.pq[0]
+
+    @property
+    def max_key(self):
+        return self.keys[self.pq[0]]
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    # property: any sequence of operations pops items in sorted order
+    for _ in xrange(500):
+        data = [random.randint(0, 20) for _ in xrange(random.randint(0, 50))]
+        for cls, ordered in ((MinPQ, sorted), (MaxPQ, lambda items: sorted(items, reverse=True))):
+            pq = cls(data)
+            model = list(data)
+            for _ in xrange(50):
+                item = random.randint(0, 20)
+                op = random.choice(('push', 'pop', 'pushpop', 'replace'))
+                if op == 'push':
+                    pq.push(item)
+                    model.append(item)
+                elif op == 'pushpop':
+                    assert pq.pushpop(item) == ordered(model + [item])[0]
+                    model.append(item)
+                    model.remove(ordered(model)[0])
+                elif model:
+                    top = ordered(model)[0]
+                    assert (pq.pop() if op == 'pop' else pq.replace(item)) == top
+                    model.remove(top)
+                    if op == 'replace':
+                        model.append(item)
+            assert [pq.pop() for _ in xrange(len(pq))] == ordered(model)
+
+    class SwapMinPQ(object):
+        """
+        The baseline: the previous heap core which swaps items pairwise and calls len() on every step
+        """
+        def __init__(self):
+            self.data = []
+
+        def push(self, item):
+            self.data.append(item)
+            self._swim(len(self) - 1)
+
+        def _swim(self, k):
+            while k > 0 and self.data[k] < self.data[(k - 1) / 2]:
+                self.data[k], self.data[(k - 1) / 2] = self.data[(k - 1) / 2], self.data[k]
+                k = (k - 1) / 2
+
+        def _sink(self, k):
+            while k * 2 + 1 < len(self):
+                j = k * 2 + 1
+                if j + 1 < len(self) and self.data[j + 1] < self.data[j]:
+                    j += 1
+                if self.data[k] <= self.data[j]:
+                    break
+                self.data[k], self.data[j] = self.data[j], self.data[k]
+                k = j
+
+        def pop(self):
+            min = self.data[0]
+            self.data[0], self.data[len(self) - 1] = self.data[len(self) - 1], self.data[0]
+            self.data.pop()
+            self._sink(0)
+            return min
+
+        def __nonzero__(self):
+            return len(self) > 0
+
+        def __len__(self):
+            return len(self.data)
+
+    # benchmark against the baseline
+    items = [random.random() for _ in xrange(200000)]
+    for cls in (SwapMinPQ, MinPQ, MaxPQ):
+        pq = cls()
+        start = time.time()
+        for item in items:
+            pq.push(item)
+        result = [pq.pop() for _ in xrange(len(items))]
+        print '{:>9}: 200k push + pop {:.3f}s'.format(cls.__name__, time.time() - start)
+        assert result == sorted(items, reverse=cls is MaxPQ)
+
+    keys = [random.randint(0, 100) for _ in xrange(100)]
+    pq = IndexMinPQ()
+    for i, key in enumerate(keys):
+        pq.insert(i, key)
+    for i in xrange(0, 100, 3):
+        keys[i] -= 50
+        pq.decrease_key(i, keys[i])
+    for i in xrange(1, 100, 3):
+        pq.delete(i)
+    remaining = [i for i in xrange(100) if i % 3 != 1]
+    result = []
+    while pq:
+        key = pq.min_key
+        result.append((key, pq.pop()))
+    assert [key for key, _ in result] == sorted(keys[i] for i in remaining)
+    assert sorted(i for _, i in result) == remaining
+
+    pq = IndexMaxPQ()
+    for i, key in enumerate([3, 1, 4, 1, 5]):
+        pq.insert(i, key)
+    pq.increase_key(1, 10)
+    assert pq.max_index == 1 and 1 in pq
+    assert [pq.pop() for _ in xrange(len(pq))] == [1, 4, 2, 0, 3]
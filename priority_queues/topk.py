@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from itertools import count, islice
+
+from priority_queues.pq_api import MinPQ
+
+
+class TopK(object):
+    """
+    Bounded container of k largest items of a stream
+    Only k entries are kept in a min oriented heap, so the smallest of them (threshold) is on the top:
+    an item which is not greater than the threshold is rejected with a single comparison,
+    a bigger one replaces the top. It runs O(N logk) in the worst case and O(N) for typical streams.
+    Entries are (key, -seq, item) so items with equal keys are never compared and the later one
+    is on the top of the heap: the earlier one wins like in heapq.nlargest.
+    """
+
+    def __init__(self, k, key=None):
+        if k <= 0:
+            raise ValueError('k must be positive: {}'.format(k))
+        self.k = k
+        self.key = key
+        self.pq = MinPQ()
+        # decreasing sequence numbers: the later of equal keys is evicted first
+        self.seq = count(0, -1)
+
+    def offer(self, item):
+        """
+        Add item if it is among k largest ones seen so far, returns True if it is accepted
+        """
+        return self._offer(item if self.key is None else self.key(item), item)
+
+    def _offer(self, key, item):
+        pq = self.pq
+        if len(pq) < self.k:
+            pq.push((key, next(self.seq), item))
+        elif pq.data[0][0] < key:
+            pq.replace((key, next(self.seq), item))
+        else:
+            return False
+        return True
+
+    def offer_many(self, items):
+        """
+        Add a batch of items, the threshold is kept in a local between replacements
+        """
+        key, pq, seq = self.key, self.pq, self.seq
+        items = iter(items)
+        for item in islice(items, self.k - len(pq)):
+            pq.push((item if key is None else key(item), next(seq), item))
+        if len(pq) < self.k:
+            return
+        data, replace = pq.data, pq.replace
+        threshold = data[0][0]
+        if key is None:
+            for item in items:
+                if threshold < item:
+                    replace((item, next(seq), item))
+                    threshold = data[0][0]
+        else:
+            for item in items:
+                priority = key(item)
+                if threshold < priority:
+                    replace((priority, next(seq), item))
+                    threshold = data[0][0]
+
+    def merge(self, other):
+        """
+        Merge TopK of another worker into this one, keys are not computed again.
+        Items are offered in the order other got them, so its ties keep their order
+        (and go after the equal items of this one).
+        """
+        for key, _, item in sorted(other.pq, key=lambda entry: -entry[1]):
+            self._offer(key, item)
+
+    @property
+    def threshold(self):
+        """
+        Key of the smallest kept item, only bigger keys are accepted when the container is full
+        """
+        return self.pq.min[0]
+
+    def items(self):
+        """
+        Returns kept items in descending order of their keys
+        """
+        return [item for _, _, item in sorted(self.pq, key=lambda entry: entry[:2], reverse=True)]
+
+    def __nonzero__(self):
+        return len(self.pq) > 0
+
+    def __len__(self):
+        return len(self.pq)
+
+    def __iter__(self):
+        return (item for _, _, item in self.pq)
+
+
+if __name__ == '__main__':
+    import heapq
+    import random
+    import time
+    from priority_queues.pq_api import MaxPQ
+
+    data = [random.randint(0, 10000) for _ in xrange(10000)]
+    top = TopK(10)
+    for item in data:
+        top.offer(item)
+    assert top.items() == sorted(data, reverse=True)[:10]
+
+    # workers keep their own TopK and the results are merged
+    words = ['w{}'.format(random.randint(0, 1000)) for _ in xrange(10000)]
+    workers = [TopK(5, key=len) for _ in xrange(4)]
+    for i, worker in enumerate(workers):
+        worker.offer_many(words[i::4])
+    for worker in workers[1:]:
+        workers[0].merge(worker)
+    assert [len(word) for word in workers[0].items()] == sorted(map(len, words), reverse=True)[:5]
+    assert len(workers[0]) == 5
+
+    # ties: the earlier items are kept and listed first
+    pairs = [(5, 'a'), (5, 'b'), (6, 'c'), (5, 'd')]
+    top = TopK(2, key=lambda pair: pair[0])
+    top.offer_many(pairs)
+    assert top.items() == [(6, 'c'), (5, 'a')]
+    top = TopK(3, key=lambda pair: pair[0])
+    for pair in pairs:
+        top.offer(pair)
+    assert top.items() == heapq.nlargest(3, pairs, key=lambda pair: pair[0])
+    other = TopK(4, key=lambda pair: pair[0])
+    other.offer_many([(5, i) for i in xrange(4)])
+    top = TopK(2, key=lambda pair: pair[0])
+    top.merge(other)
+    assert top.items() == [(5, 0), (5, 1)]
+
+    # benchmark against a full MaxPQ
+    n = 1000000
+    stream = [random.random() for _ in xrange(n)]
+    start = time.time()
+    pq = MaxPQ(stream)
+    expected = [pq.pop() for _ in xrange(100)]
+    print 'MaxPQ of {} items: {:.3f}s'.format(n, time.time() - start)
+    start = time.time()
+    top = TopK(100)
+    top.offer_many(stream)
+    assert top.items() == expected
+    print 'TopK(100).offer_many: {:.3f}s'.format(time.time() - start)
@@ -1 +1,11 @@
 __author__ = 'renat'
+
+
+def sort(items, algorithm='intro', backend='auto'):
+    """
+    Sort items inplace, see sorting.dispatch.sort.
+    The dispatcher (and numpy with all the algorithms) is imported on the first call only,
+    so importing a single sorting module stays cheap.
+    """
+    from sorting.dispatch import sort as dispatch_sort
+    dispatch_sort(items, algorithm, backend)
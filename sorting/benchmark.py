@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark and regression suite for the sorting algorithms.
+Every algorithm is run on every input distribution it supports and the results
+(wall time, comparisons, array accesses and recursion depth) are emitted as JSON, so they can be diffed across versions:
+
+python -m sorting.benchmark --sizes 1000 10000 --output results.json
+"""
+import argparse
+import bisect
+import json
+import platform
+import random
+import string
+import sys
+import timeit
+
+from sorting.instrument import profile
+from sorting.insertion_sort import insertion_sort
+from sorting.merge_sort import merge_sort, merge_sort_bu, merge_sort_natural, merge_sort_py
+from sorting.quick_sort import qsort, qsort_3w, qsort_py, introsort
+from sorting.selection_sort import selection_sort
+from sorting.shell_sort import shell_sort
+from priority_queues.heap_sort import heap_sort, heap_sort_bottom_up
+from string_sorting.key_index_count import key_index_sort
+from string_sorting.lsd_radix_sort import lsd_radix_sort
+from string_sorting.msd_radix_sort import msd_radix_sort
+
+# length of the generated strings (LSD radix sort requires strings of equal length)
+STRING_LENGTH = 8
+
+
+# input distributions
+
+def random_ints(n, rng):
+    return [rng.randint(0, n) for _ in xrange(n)]
+
+
+def sorted_ints(n, rng):
+    return range(n)
+
+
+def reversed_ints(n, rng):
+    return range(n, 0, -1)
+
+
+def organ_pipe(n, rng):
+    """
+    Ascending first half and descending second half: 0 1 2 3 3 2 1 0
+    """
+    return range(n / 2) + range(n - n / 2 - 1, -1, -1)
+
+
+def few_unique(n, rng):
+    return [rng.randint(0, 9) for _ in xrange(n)]
+
+
+def zipfian(n, rng, distinct=None, s=1.1):
+    """
+    Keys 0..distinct-1 where the frequency of key k is proportional to 1 / (k + 1) ** s
+    """
+    if distinct is None:
+        distinct = max(1, n / 10)
+    cumulates = []
+    total = 0
+    for k in xrange(1, distinct + 1):
+        total += 1.0 / (k ** s)
+        cumulates.append(total)
+    return [bisect.bisect(cumulates, rng.random() * total) for _ in xrange(n)]
+
+
+def nearly_sorted(n, rng):
+    """
+    Sorted list with 1% of items exchanged at random
+    """
+    items = range(n)
+    for _ in xrange(max(1, n / 100)):
+        i = rng.randint(0, n - 1)
+        j = rng.randint(0, n - 1)
+        items[i], items[j] = items[j], items[i]
+    return items
+
+
+def random_strings(n, rng):
+    return [''.join(rng.choice(string.ascii_lowercase) for _ in xrange(STRING_LENGTH)) for _ in xrange(n)]
+
+
+DISTRIBUTIONS = {
+    'random': random_ints,
+    'sorted': sorted_ints,
+    'reversed': reversed_ints,
+    'organ_pipe': organ_pipe,
+    'few_unique': few_unique,
+    'zipfian': zipfian,
+    'nearly_sorted': nearly_sorted,
+    'strings': random_strings,
+}
+
+INTS = ('random', 'sorted', 'reversed', 'organ_pipe', 'few_unique', 'zipfian', 'nearly_sorted')
+ALL = INTS + ('strings',)
+
+
+# algorithms: name -> (sort function, supported distributions, is quadratic, compares items)
+# functions returning a new list are wrapped to sort inplace.
+# parallel and external sorts are not here: they work with processes and files.
+
+def _inplace(sort):
+    def wrapper(items):
+        items[:] = sort(items)
+    return wrapper
+
+
+ALGORITHMS = {
+    'insertion_sort': (insertion_sort, ALL, True, True),
+    'selection_sort': (selection_sort, ALL, True, True),
+    'shell_sort': (shell_sort, ALL, False, True),
+    'shell_sort_sedgewick': (lambda items: shell_sort(items, gaps='sedgewick'), ALL, False, True),
+    'shell_sort_ciura': (lambda items: shell_sort(items, gaps='ciura'), ALL, False, True),
+    'shell_sort_tokuda': (lambda items: shell_sort(items, gaps='tokuda'), ALL, False, True),
+    'merge_sort': (merge_sort, ALL, False, True),
+    'merge_sort_bu': (merge_sort_bu, ALL, False, True),
+    'merge_sort_natural': (merge_sort_natural, ALL, False, True),
+    'merge_sort_py': (_inplace(merge_sort_py), ALL, False, True),
+    'qsort': (qsort, ALL, False, True),
+    'qsort_dual_pivot': (lambda items: qsort(items, strategy='dual_pivot'), ALL, False, True),
+    'qsort_3w': (qsort_3w, ALL, False, True),
+    'qsort_py': (_inplace(qsort_py), ALL, False, True),
+    'introsort': (introsort, ALL, False, True),
+    'heap_sort': (heap_sort, ALL, False, True),
+    'heap_sort_bottom_up': (heap_sort_bottom_up, ALL, False, True),
+    'key_index_sort': (lambda items: key_index_sort(items, max(items) + 1), ('few_unique', 'zipfian'),
+                       False, False),
+    'lsd_radix_sort': (lambda items: lsd_radix_sort(items, STRING_LENGTH), ('strings',), False, False),
+    'msd_radix_sort': (msd_radix_sort, ('strings',), False, False),
+}
+
+
+def measure(sort, data, repeat=1, compares=True):
+    """
+    Runs sort on copies of data and returns the result dict:
+    the best wall time, whether the output is sorted and SortStats counters.
+    Comparisons are not counted for algorithms which do not compare items (radix sorts).
+    """
+    result = {}
+    best = None
+    output = None
+    for _ in xrange(repeat):
+        items = data[:]
+        start = timeit.default_timer()
+        try:
+            sort(items)
+        except RuntimeError as e:
+            # e.g. maximum recursion depth exceeded
+            result['error'] = str(e)
+            return result
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+        output = items
+    result['time'] = best
+    result['sorted'] = output == sorted(data)
+
+    try:
+        result.update(profile(sort, data[:], compares).as_dict())
+    except RuntimeError as e:
+        # counting wrappers make the stack deeper
+        result['error'] = str(e)
+        return result
+    if not compares:
+        result['comparisons'] = None
+    return result
+
+
+def run(sizes=(1000,), distributions=None, algorithms=None, repeat=1, seed=0, max_quadratic_size=5000):
+    """
+    Runs the benchmark suite and returns the list of results.
+    Quadratic algorithms are skipped for sizes bigger than max_quadratic_size.
+    """
+    distributions = sorted(distributions or DISTRIBUTIONS)
+    algorithms = sorted(algorithms or ALGORITHMS)
+    results = []
+    for n in sizes:
+        for distribution in distributions:
+            data = DISTRIBUTIONS[distribution](n, random.Random(seed))
+            for name in algorithms:
+                sort, supported, quadratic, compares = ALGORITHMS[name]
+                if distribution not in supported or (quadratic and n > max_quadratic_size):
+                    continue
+                result = {'algorithm': name, 'distribution': distribution, 'n': n}
+                result.update(measure(sort, data, repeat, compares))
+                results.append(result)
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Sorting algorithms benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000])
+    parser.add_argument('--distributions', nargs='+', choices=sorted(DISTRIBUTIONS))
+    parser.add_argument('--algorithms', nargs='+', choices=sorted(ALGORITHMS))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-quadratic-size', type=int, default=5000)
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args(args)
+
+    results = run(args.sizes, args.distributions, args.algorithms, args.repeat, args.seed,
+                  args.max_quadratic_size)
+    report = {
+        'python': platform.python_version(),
+        'sizes': args.sizes,
+        'seed': args.seed,
+        'results': results,
+    }
+    json.dump(report, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+
+def decorated_sort(items, sort, key=None, reverse=False, lo=0, hi=None):
+    """
+    Decorate-sort-undecorate: sorts lo..hi range of items with the given sort function
+    by precomputed keys. Key function is called exactly once for every item.
+    Items themselves are never compared, the sort runs over (key, index) pairs,
+    so the result is stable whatever sort function is used.
+    """
+    if hi is None:
+        hi = len(items) - 1
+    part = items[lo:hi + 1]
+    keys = part if key is None else [key(item) for item in part]
+    if reverse:
+        # sort by negative index and reverse the result, so equal items keep their original order
+        decorated = zip(keys, xrange(0, -len(part), -1))
+        sort(decorated)
+        decorated.reverse()
+        items[lo:hi + 1] = [part[-i] for _, i in decorated]
+    else:
+        decorated = zip(keys, xrange(len(part)))
+        sort(decorated)
+        items[lo:hi + 1] = [part[i] for _, i in decorated]
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    from sorting.merge_sort import merge_sort
+
+    class Record(object):
+        def __init__(self, id, value):
+            self.id = id
+            self.value = value
+
+    calls = [0]
+
+    def key(record):
+        calls[0] += 1
+        return record.value
+
+    class KeyWrapper(object):
+        """
+        The way to sort records by a field without key support: wrapper calls key on every compare
+        """
+        def __init__(self, record):
+            self.record = record
+
+        def __lt__(self, other):
+            return key(self.record) < key(other.record)
+
+    records = [Record(i, random.randint(0, 1000)) for i in xrange(50000)]
+
+    wrapped = [KeyWrapper(r) for r in records]
+    start = time.time()
+    merge_sort(wrapped)
+    print 'wrappers: {} key calls, {:.3f}s'.format(calls[0], time.time() - start)
+
+    calls[0] = 0
+    items = records[:]
+    start = time.time()
+    merge_sort(items, key=key)
+    print 'key=: {} key calls, {:.3f}s'.format(calls[0], time.time() - start)
+    assert calls[0] == len(records)
+    assert [r.record for r in wrapped] == items
+
+    items = records[:]
+    merge_sort(items, key=key, reverse=True)
+    assert items == sorted(records, key=key, reverse=True)
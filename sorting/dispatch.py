@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Common entry point for all the sorting algorithms.
+Optional requirements:
+numpy
+"""
+from array import array
+
+from sorting.insertion_sort import insertion_sort
+from sorting.merge_sort import merge_sort, merge_sort_bu, merge_sort_natural
+from sorting.quick_sort import qsort, qsort_3w, introsort
+from sorting.selection_sort import selection_sort
+from sorting.shell_sort import shell_sort
+from priority_queues.heap_sort import heap_sort, heap_sort_bottom_up
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ALGORITHMS = {
+    'insertion': insertion_sort,
+    'selection': selection_sort,
+    'shell': shell_sort,
+    'merge': merge_sort,
+    'merge_bu': merge_sort_bu,
+    'merge_natural': merge_sort_natural,
+    'quick': qsort,
+    'quick_3w': qsort_3w,
+    'dual_pivot': lambda items: qsort(items, strategy='dual_pivot'),
+    'intro': introsort,
+    'heap': heap_sort,
+    'heap_bu': heap_sort_bottom_up,
+}
+
+# numpy kernels used instead of the pure python algorithms
+NUMPY_KINDS = {
+    'merge': 'mergesort',
+    'merge_bu': 'mergesort',
+    'merge_natural': 'mergesort',
+    'heap': 'heapsort',
+    'heap_bu': 'heapsort',
+}
+
+# array.array typecodes which numpy understands
+NUMERIC_TYPECODES = 'bBhHiIlLqQfd'
+
+
+def sort(items, algorithm='intro', backend='auto'):
+    """
+    Sort items inplace with the given algorithm.
+    Backends:
+    python - pure python implementation of the algorithm, it works with any comparable items
+    numpy - vectorized numpy kernel, items must be a numpy array or a numeric array.array
+    auto - numpy for numeric buffers if numpy is installed and python for everything else
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError('Unknown sorting algorithm "{}"'.format(algorithm))
+    if backend == 'auto':
+        backend = 'numpy' if numpy is not None and _is_numeric_buffer(items) else 'python'
+
+    if backend == 'python':
+        if isinstance(items, list):
+            ALGORITHMS[algorithm](items)
+        else:
+            # slices of buffers are not copies (numpy) or are slow to swap items in (array),
+            # so sort the plain list and copy items back
+            data = list(items)
+            ALGORITHMS[algorithm](data)
+            items[:] = array(items.typecode, data) if isinstance(items, array) else data
+    elif backend == 'numpy':
+        if numpy is None:
+            raise ImportError('numpy backend requires numpy to be installed')
+        if not _is_numeric_buffer(items):
+            raise TypeError('numpy backend requires a numpy array or a numeric array.array')
+        if isinstance(items, array):
+            # zero copy view: items are sorted in the memory of the array
+            items = numpy.frombuffer(items, dtype=items.typecode)
+        items.sort(kind=NUMPY_KINDS.get(algorithm, 'quicksort'))
+    else:
+        raise ValueError('Unknown sorting backend "{}"'.format(backend))
+
+
+def _is_numeric_buffer(items):
+    if isinstance(items, array):
+        return items.typecode in NUMERIC_TYPECODES
+    return numpy is not None and isinstance(items, numpy.ndarray) and items.ndim == 1 and \
+        numpy.issubdtype(items.dtype, numpy.number)
+
+
+if __name__ == '__main__':
+    import random
+    from sorting.check_sorting import is_sorted
+
+    for algorithm in ALGORITHMS:
+        items = range(100)
+        random.shuffle(items)
+        sort(items, algorithm=algorithm)
+        assert is_sorted(items)
+
+        items = array('d', (random.random() for _ in xrange(100)))
+        sort(items, algorithm=algorithm)
+        assert is_sorted(items)
+
+    items = ['b', 'c', 'a']
+    sort(items, backend='auto')
+    assert items == ['a', 'b', 'c']
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import marshal
+import struct
+import sys
+import tempfile
+
+from priority_queues.pq_api import MinPQ
+from sorting.merge_sort import merge_sort
+
+# default memory budget for records which are sorted in memory at once (bytes)
+MEMORY_LIMIT = 64 * 1024 * 1024
+# default number of runs merged at once
+FAN_IN = 16
+# memory of a chunk entry besides the record string: (record, line number) tuple, the line number,
+# the slots in the chunk list and in the auxiliary list of merge sort
+ENTRY_OVERHEAD = sys.getsizeof(('', sys.maxint)) + sys.getsizeof(sys.maxint) + 2 * struct.calcsize('P')
+
+
+def external_sort(input_file, output_file, memory_limit=MEMORY_LIMIT, fan_in=FAN_IN, index=False):
+    """
+    External merge sort for files which do not fit in memory.
+    Every line of the input file is a record. Records are read in chunks which fit in memory_limit
+    (record strings with the tuples, line numbers and list slots which hold them while sorting),
+    every chunk is sorted in memory and spilled to a temporary file as a sorted run.
+    Runs are merged with k-way merge (fan_in runs at once) until the only run is left.
+    Every fan_in runs of the same size are merged as soon as they are spilled,
+    so only O(fan_in * log(runs)) temporary files are open at once.
+    If index is True line numbers of the records in sorted order are written instead of records.
+    The sort is stable.
+    """
+    if memory_limit <= 0:
+        raise ValueError('memory_limit must be positive: {}'.format(memory_limit))
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2: {}'.format(fan_in))
+    runs = _split_runs(input_file, memory_limit, fan_in)
+    # merge runs in several passes if there are too many of them
+    while len(runs) > fan_in:
+        runs = [_merge_to_run(runs[i:i + fan_in]) for i in xrange(0, len(runs), fan_in)]
+
+    for record, i in _merge_runs(runs):
+        if index:
+            output_file.write('{}\n'.format(i))
+        else:
+            output_file.write(record + '\n')
+
+
+def _split_runs(input_file, memory_limit, fan_in):
+    """
+    Read chunks of records which fit in memory, sort them and spill to temporary files.
+    Runs are kept in levels like digits of a counter: level h holds runs of fan_in^h chunks,
+    when it gets fan_in runs they are merged into one run of the next level.
+    """
+    levels = []
+
+    def add(run):
+        for level in levels:
+            level.append(run)
+            if len(level) < fan_in:
+                return
+            run = _merge_to_run(level)
+            del level[:]
+        levels.append([run])
+
+    chunk = []
+    size = 0
+    for i, line in enumerate(input_file):
+        record = line.rstrip('\n')
+        # line number goes with every record: it is a tie breaker which keeps the sort stable
+        chunk.append((record, i))
+        size += sys.getsizeof(record) + ENTRY_OVERHEAD
+        if size >= memory_limit:
+            add(_spill(chunk))
+            chunk = []
+            size = 0
+    if chunk or not levels:
+        add(_spill(chunk))
+    return [run for level in levels for run in level]
+
+
+def _spill(chunk):
+    """
+    Sort records in memory and write them to the temporary file
+    """
+    merge_sort(chunk)
+    run = tempfile.TemporaryFile()
+    for entry in chunk:
+        marshal.dump(entry, run)
+    run.seek(0)
+    return run
+
+
+def _merge_to_run(runs):
+    """
+    Merge runs into a new temporary file, the merged ones are closed
+    """
+    run = tempfile.TemporaryFile()
+    for entry in _merge_runs(runs):
+        marshal.dump(entry, run)
+    run.seek(0)
+    return run
+
+
+def _iter_run(run):
+    while True:
+        try:
+            yield marshal.load(run)
+        except EOFError:
+            run.close()
+            return
+
+
+def _merge_runs(runs):
+    """
+    K-way merge: yields (record, line number) entries of sorted runs in sorted order
+    """
+    iterators = [_iter_run(run) for run in runs]
+    pq = MinPQ()
+    for r, it in enumerate(iterators):
+        for entry in it:
+            pq.push((entry, r))
+            break
+    while pq:
+        entry, r = pq.pop()
+        yield entry
+        # replace the smallest entry with the next one from the same run
+        for entry in iterators[r]:
+            pq.push((entry, r))
+            break
+
+
+if __name__ == '__main__':
+    import random
+    from StringIO import StringIO
+
+    lines = [str(random.randint(0, 1000)) for _ in xrange(10000)]
+    output = StringIO()
+    external_sort(StringIO('\n'.join(lines)), output, memory_limit=4096, fan_in=4)
+    assert output.getvalue().splitlines() == sorted(lines)
+
+    output = StringIO()
+    external_sort(StringIO('\n'.join(lines)), output, memory_limit=4096, fan_in=4, index=True)
+    permutation = [int(i) for i in output.getvalue().splitlines()]
+    assert permutation == sorted(xrange(len(lines)), key=lambda i: lines[i])
+
+    output = StringIO()
+    external_sort(StringIO(''), output)
+    assert output.getvalue() == ''
+
+    for kwargs in ({'fan_in': 1}, {'fan_in': 0}, {'memory_limit': 0}):
+        try:
+            external_sort(StringIO('\n'.join(lines)), StringIO(), **kwargs)
+            assert False
+        except ValueError:
+            pass
+
+    # many runs: open files stay bounded
+    import resource
+    limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, limit[1]))
+    try:
+        lines = [str(random.randint(0, 10 ** 6)) for _ in xrange(20000)]
+        output = StringIO()
+        external_sort(StringIO('\n'.join(lines)), output, memory_limit=2000, fan_in=4)
+        assert output.getvalue().splitlines() == sorted(lines)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, limit)
@@ -1,16 +1,22 @@
 # -*- coding: utf-8 -*-
+from sorting.decorate import decorated_sort
 
 
-def insertion_sort(items):
+def insertion_sort(items, lo=0, hi=None, key=None, reverse=False):
     """
     Insertion sort
+    Sorts the whole list or only the range lo..hi (inclusive) if it's given
     """
-    n = len(items)
+    if key is not None or reverse:
+        decorated_sort(items, insertion_sort, key, reverse, lo, hi)
+        return
+    if hi is None:
+        hi = len(items) - 1
     # iterate over every item
-    for i in xrange(n):
+    for i in xrange(lo, hi + 1):
         j = i
         # if the current item is not in order
-        while j > 0 and items[j] < items[j - 1]:
+        while j > lo and items[j] < items[j - 1]:
             # exchange those items
             items[j], items[j - 1] = items[j - 1], items[j]
             j -= 1
@@ -23,4 +29,7 @@ if __name__ == '__main__':
     items = range(100)
     random.shuffle(items)
     insertion_sort(items)
-    assert is_sorted(items)
\ No newline at end of file
+    assert is_sorted(items)
+    random.shuffle(items)
+    insertion_sort(items, 10, 19)
+    assert is_sorted(items[10:20])
\ No newline at end of file
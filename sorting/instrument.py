@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation for the sorting algorithms: counts comparisons, exchanges, array accesses and recursion depth.
+Sorting code itself is never changed, so there is no overhead at all when the instrumentation is not used:
+items are wrapped with counting objects and sorting helpers are replaced with counting wrappers
+only for the time of profile() call (it is not thread safe).
+
+stats = profile(qsort, items)
+print stats.comparisons, stats.exchanges, stats.max_depth, stats.helpers['quick_sort._partition']
+"""
+import importlib
+from collections import defaultdict
+from contextlib import contextmanager
+
+# helpers which are instrumented: (module, function, is recursive, swaps)
+# recursive helpers track recursion depth, the others track comparisons, exchanges and array accesses
+# of every call. Exchanges are counted only in swap based code: the helpers which merge or move items
+# into a hole (swaps is False) write without exchanging, their writes are not taken for exchanges.
+HOOKS = [
+    ('sorting.quick_sort', '_sort', True, True),
+    ('sorting.quick_sort', '_sort_3w', True, True),
+    ('sorting.quick_sort', '_sort_dual_pivot', True, True),
+    ('sorting.quick_sort', '_introsort', True, True),
+    ('sorting.quick_sort', '_partition', False, True),
+    ('sorting.merge_sort', '_sort', True, False),
+    ('sorting.merge_sort', '_merge', False, False),
+    ('sorting.merge_sort', '_merge_runs', False, False),
+    ('priority_queues.heap_sort', '_sink', False, True),
+    ('priority_queues.heap_sort', '_sift_floyd', False, False),
+]
+
+
+class SortStats(object):
+    """
+    Counters collected by profile()
+    An exchange is a pair of writes which swaps two items (items[i], items[j] = items[j], items[i]).
+    Merge and hole based sorts move items without exchanging them, writes is the metric for them.
+    """
+
+    def __init__(self):
+        self.comparisons = 0
+        self.exchanges = 0
+        # exchanges are counted only while it is True (swap based code is running),
+        # (index, overwritten item, written item) of the last write which may start an exchange
+        self.swapping = True
+        self.last_write = None
+        self.reads = 0
+        self.writes = 0
+        self.depth = 0
+        self.max_depth = 0
+        # per helper counters: 'quick_sort._partition' -> {'calls': 3, 'comparisons': 20, ...}
+        self.helpers = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def accesses(self):
+        return self.reads + self.writes
+
+    def as_dict(self):
+        return {
+            'comparisons': self.comparisons,
+            'exchanges': self.exchanges,
+            'reads': self.reads,
+            'writes': self.writes,
+            'accesses': self.accesses,
+            'max_depth': self.max_depth,
+            'helpers': dict((name, dict(counters)) for name, counters in self.helpers.iteritems()),
+        }
+
+    def __repr__(self):
+        return '<SortStats comparisons={} exchanges={} accesses={} max_depth={}>'.format(
+            self.comparisons, self.exchanges, self.accesses, self.max_depth)
+
+
+class CountedItem(object):
+    """
+    Item wrapper which counts all the comparisons
+    """
+    __slots__ = ('value', 'stats')
+
+    def __init__(self, value, stats):
+        self.value = value
+        self.stats = stats
+
+    def __lt__(self, other):
+        self.stats.comparisons += 1
+        return self.value < other.value
+
+    def __le__(self, other):
+        self.stats.comparisons += 1
+        return self.value <= other.value
+
+    def __gt__(self, other):
+        self.stats.comparisons += 1
+        return self.value > other.value
+
+    def __ge__(self, other):
+        self.stats.comparisons += 1
+        return self.value >= other.value
+
+    def __eq__(self, other):
+        self.stats.comparisons += 1
+        return self.value == other.value
+
+    def __ne__(self, other):
+        self.stats.comparisons += 1
+        return self.value != other.value
+
+
+class CountingList(list):
+    """
+    List which counts reads and writes of items
+    A write which puts back the item overwritten by the previous write, at the index it came from,
+    completes an exchange.
+    """
+
+    def __init__(self, items, stats):
+        super(CountingList, self).__init__(items)
+        self.stats = stats
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self.stats.reads += len(xrange(*index.indices(len(self))))
+        else:
+            self.stats.reads += 1
+        return super(CountingList, self).__getitem__(index)
+
+    def __setitem__(self, index, value):
+        stats = self.stats
+        if isinstance(index, slice):
+            stats.writes += len(xrange(*index.indices(len(self))))
+            stats.last_write = None
+        else:
+            stats.writes += 1
+            if stats.swapping:
+                old = super(CountingList, self).__getitem__(index)
+                last = stats.last_write
+                if last is not None and last[0] != index and value is last[1] and old is last[2]:
+                    stats.exchanges += 1
+                    stats.last_write = None
+                else:
+                    stats.last_write = (index, old, value)
+        super(CountingList, self).__setitem__(index, value)
+
+    # python 2 list calls __getslice__ and __setslice__ for simple slices
+
+    def __getslice__(self, i, j):
+        self.stats.reads += len(xrange(*slice(i, j).indices(len(self))))
+        return super(CountingList, self).__getslice__(i, j)
+
+    def __setslice__(self, i, j, sequence):
+        self.stats.writes += len(xrange(*slice(i, j).indices(len(self))))
+        self.stats.last_write = None
+        super(CountingList, self).__setslice__(i, j, sequence)
+
+
+def profile(sort, items, compares=True):
+    """
+    Sorts items inplace with the sort function and returns SortStats.
+    Set compares to False for algorithms which do not compare items (radix sorts):
+    such items are not wrapped and only array accesses are counted (no exchanges either,
+    equal plain values can not be told apart).
+    """
+    stats = SortStats()
+    stats.swapping = compares
+    if compares:
+        counted = CountingList([CountedItem(item, stats) for item in items], stats)
+    else:
+        counted = CountingList(items, stats)
+    with _hooks(stats):
+        sort(counted)
+    items[:] = [item.value for item in counted] if compares else list(counted)
+    return stats
+
+
+@contextmanager
+def _hooks(stats):
+    """
+    Replaces sorting helpers with counting wrappers and restores them on exit
+    """
+    originals = []
+    try:
+        for module_name, name, recursive, swaps in HOOKS:
+            module = importlib.import_module(module_name)
+            function = getattr(module, name)
+            originals.append((module, name, function))
+            setattr(module, name, _hook(stats, module_name.split('.')[-1] + '.' + name, function, recursive,
+                                        swaps and stats.swapping))
+        yield stats
+    finally:
+        for module, name, function in originals:
+            setattr(module, name, function)
+
+
+def _hook(stats, name, function, recursive, swaps):
+    if recursive:
+        def wrapper(*args, **kwargs):
+            stats.helpers[name]['calls'] += 1
+            stats.depth += 1
+            stats.max_depth = max(stats.max_depth, stats.depth)
+            swapping, stats.swapping = stats.swapping, swaps
+            stats.last_write = None
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.depth -= 1
+                stats.swapping = swapping
+                stats.last_write = None
+    else:
+        def wrapper(*args, **kwargs):
+            comparisons, exchanges, reads, writes = stats.comparisons, stats.exchanges, stats.reads, stats.writes
+            swapping, stats.swapping = stats.swapping, swaps
+            stats.last_write = None
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.swapping = swapping
+                stats.last_write = None
+                counters = stats.helpers[name]
+                counters['calls'] += 1
+                counters['comparisons'] += stats.comparisons - comparisons
+                counters['exchanges'] += stats.exchanges - exchanges
+                counters['reads'] += stats.reads - reads
+                counters['writes'] += stats.writes - writes
+    return wrapper
+
+
+if __name__ == '__main__':
+    import random
+    from sorting.quick_sort import qsort
+    from sorting.merge_sort import merge_sort
+    from sorting.shell_sort import shell_sort
+    from priority_queues.heap_sort import heap_sort
+
+    data = range(1000)
+    random.shuffle(data)
+    for sort in (qsort, merge_sort, shell_sort, heap_sort):
+        items = data[:]
+        stats = profile(sort, items)
+        assert items == sorted(data)
+        print sort.__name__, stats, stats.as_dict()['helpers']
+
+    # every adjacent exchange of insertion sort fixes exactly one inversion
+    from sorting.insertion_sort import insertion_sort
+    items = data[:200]
+    inversions = sum(1 for i in xrange(200) for j in xrange(i + 1, 200) if items[i] > items[j])
+    assert profile(insertion_sort, items).exchanges == inversions
+    # merging moves items without exchanges
+    assert profile(merge_sort, data[:]).exchanges == 0
+    assert profile(heap_sort, data[:]).exchanges > 0
+
+    import sorting.quick_sort
+    # helpers are restored
+    assert sorting.quick_sort._partition.__name__ == '_partition'
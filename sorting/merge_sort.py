@@ -1,4 +1,11 @@
 # -*- coding: utf-8 -*-
+from bisect import bisect_left, bisect_right
+from sorting.decorate import decorated_sort
+
+# runs shorter than this are extended with binary insertion sort
+MIN_MERGE = 64
+# switch to galloping mode after this number of consecutive wins of one run
+MIN_GALLOP = 7
 
 
 def merge_sort_py(items):
@@ -31,18 +38,24 @@ def _merge_lists(left, right):
     return result
 
 
-def merge_sort(items):
+def merge_sort(items, key=None, reverse=False):
     """
     Classical merge sort
     """
+    if key is not None or reverse:
+        decorated_sort(items, merge_sort, key, reverse)
+        return
     _sort(items, items[:], 0, len(items) - 1)
 
 
-def merge_sort_bu(items):
+def merge_sort_bu(items, key=None, reverse=False):
     """
     Bottom-up merge sort
     No recursion is used
     """
+    if key is not None or reverse:
+        decorated_sort(items, merge_sort_bu, key, reverse)
+        return
     aux = items[:]
     size = 1
     while size < len(items):
@@ -57,6 +70,199 @@ def merge_sort_bu(items):
         size *= 2
 
 
+def merge_sort_natural(items):
+    """
+    Adaptive merge sort over natural runs (like TimSort by Tim Peters)
+    Ascending and strictly descending runs are detected (descending ones are reversed),
+    short runs are extended with binary insertion sort and merged with galloping.
+    It is stable and runs ~N on already ordered data.
+    Extra space is never bigger than the smaller of two merged runs.
+    """
+    n = len(items)
+    if n < 2:
+        return
+    min_run = _min_run_length(n)
+    # stack of pending runs (start, length)
+    runs = []
+    lo = 0
+    while lo < n:
+        length = _count_run(items, lo, n)
+        if length < min_run:
+            # extend the run with binary insertion sort
+            force = min(min_run, n - lo)
+            _binary_insertion_sort(items, lo, lo + force - 1, lo + length)
+            length = force
+        runs.append((lo, length))
+        _merge_collapse(items, runs)
+        lo += length
+    while len(runs) > 1:
+        _merge_at(items, runs, len(runs) - 2)
+
+
+def _min_run_length(n):
+    """
+    Minimal run length: N / min_run is equal to or a bit less than a power of 2
+    """
+    r = 0
+    while n >= MIN_MERGE:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+
+def _count_run(items, lo, n):
+    """
+    Returns length of the run which starts at lo. Descending run is reversed inplace.
+    """
+    hi = lo + 1
+    if hi == n:
+        return 1
+    if items[hi] < items[lo]:
+        # strictly descending run (strict to keep the sort stable)
+        while hi + 1 < n and items[hi + 1] < items[hi]:
+            hi += 1
+        items[lo:hi + 1] = items[lo:hi + 1][::-1]
+    else:
+        while hi + 1 < n and not items[hi + 1] < items[hi]:
+            hi += 1
+    return hi - lo + 1
+
+
+def _binary_insertion_sort(items, lo, hi, start):
+    """
+    Sorts lo..hi range where lo..start-1 items are already sorted
+    """
+    for i in xrange(start, hi + 1):
+        item = items[i]
+        pos = bisect_right(items, item, lo, i)
+        # shift the greater items to the right at once
+        items[pos + 1:i + 1] = items[pos:i]
+        items[pos] = item
+
+
+def _merge_collapse(items, runs):
+    """
+    Merges pending runs until run lengths on the stack hold invariants:
+    runs[-3] > runs[-2] + runs[-1] and runs[-2] > runs[-1]
+    """
+    while len(runs) > 1:
+        n = len(runs) - 2
+        if (n > 0 and runs[n - 1][1] <= runs[n][1] + runs[n + 1][1]) or \
+                (n > 1 and runs[n - 2][1] <= runs[n - 1][1] + runs[n][1]):
+            if runs[n - 1][1] < runs[n + 1][1]:
+                n -= 1
+        elif runs[n][1] > runs[n + 1][1]:
+            break
+        _merge_at(items, runs, n)
+
+
+def _merge_at(items, runs, i):
+    """
+    Merges runs i and i + 1 on the stack
+    """
+    lo, length1 = runs[i]
+    mid, length2 = runs[i + 1]
+    runs[i] = (lo, length1 + length2)
+    del runs[i + 1]
+    _merge_runs(items, lo, mid - 1, mid + length2 - 1)
+
+
+def _merge_runs(items, lo, mid, hi):
+    """
+    Merges sorted runs lo..mid and mid+1..hi
+    """
+    # items of the left run which are not greater than the first item of the right run are in place
+    lo = bisect_right(items, items[mid + 1], lo, mid + 1)
+    if lo > mid:
+        return
+    # items of the right run which are not less than the last item of the left run are in place
+    hi = bisect_left(items, items[mid], mid + 1, hi + 1) - 1
+    if mid - lo <= hi - mid - 1:
+        _merge_lo(items, lo, mid, hi)
+    else:
+        _merge_hi(items, lo, mid, hi)
+
+
+def _merge_lo(items, lo, mid, hi):
+    """
+    Merges runs from left to right when the left run is smaller (only the left run is copied)
+    """
+    aux = items[lo:mid + 1]
+    a, na = 0, len(aux)
+    b = mid + 1
+    k = lo
+    wins_a = wins_b = 0
+    while a < na and b <= hi:
+        if wins_a >= MIN_GALLOP:
+            # copy all the left items which are not greater than the current right one at once
+            end = bisect_right(aux, items[b], a, na)
+            items[k:k + end - a] = aux[a:end]
+            k += end - a
+            a = end
+            wins_a = 0
+        elif wins_b >= MIN_GALLOP:
+            # copy all the right items which are less than the current left one at once
+            end = bisect_left(items, aux[a], b, hi + 1)
+            items[k:k + end - b] = items[b:end]
+            k += end - b
+            b = end
+            wins_b = 0
+        elif items[b] < aux[a]:
+            items[k] = items[b]
+            b += 1
+            k += 1
+            wins_b += 1
+            wins_a = 0
+        else:
+            items[k] = aux[a]
+            a += 1
+            k += 1
+            wins_a += 1
+            wins_b = 0
+    # the rest of the right run is already in place
+    items[k:k + na - a] = aux[a:]
+
+
+def _merge_hi(items, lo, mid, hi):
+    """
+    Merges runs from right to left when the right run is smaller (only the right run is copied)
+    """
+    aux = items[mid + 1:hi + 1]
+    a = mid
+    b = len(aux) - 1
+    k = hi
+    wins_a = wins_b = 0
+    while b >= 0 and a >= lo:
+        if wins_a >= MIN_GALLOP:
+            # copy all the left items which are greater than the current right one at once
+            start = bisect_right(items, aux[b], lo, a + 1)
+            items[k - a + start:k + 1] = items[start:a + 1]
+            k -= a + 1 - start
+            a = start - 1
+            wins_a = 0
+        elif wins_b >= MIN_GALLOP:
+            # copy all the right items which are not less than the current left one at once
+            start = bisect_left(aux, items[a], 0, b + 1)
+            items[k - b + start:k + 1] = aux[start:b + 1]
+            k -= b + 1 - start
+            b = start - 1
+            wins_b = 0
+        elif aux[b] < items[a]:
+            items[k] = items[a]
+            a -= 1
+            k -= 1
+            wins_a += 1
+            wins_b = 0
+        else:
+            items[k] = aux[b]
+            b -= 1
+            k -= 1
+            wins_b += 1
+            wins_a = 0
+    # the rest of the left run is already in place
+    items[k - b:k + 1] = aux[:b + 1]
+
+
 def _sort(items, aux, lo, hi):
     """
     Recursive sorting function
@@ -113,4 +319,13 @@ if __name__ == '__main__':
     assert is_sorted(items)
     random.shuffle(items)
     items = merge_sort_py(items)
+    assert is_sorted(items)
+    random.shuffle(items)
+    merge_sort_natural(items)
+    assert is_sorted(items)
+    # nearly sorted data: appended log with a few late arrivals
+    items = range(100000)
+    for _ in xrange(10):
+        items.insert(random.randint(0, len(items)), random.randint(0, len(items)))
+    merge_sort_natural(items)
     assert is_sorted(items)
\ No newline at end of file
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import heapq
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+from sorting.merge_sort import merge_sort
+
+# chunks smaller than this are not worth sending to another process
+MIN_CHUNK_SIZE = 10000
+
+# shared buffer with the items, it is handed to every worker once when the pool starts
+_shared = None
+
+
+def parallel_merge_sort(items, workers=None):
+    """
+    Merge sort which sorts chunks of the list in a pool of processes.
+    Numeric items are copied to a shared memory buffer once (nothing is pickled),
+    every worker sorts its own chunk inplace and then sorted chunks are merged with k-way merge.
+    It is stable, so the result is exactly the same as merge_sort gives.
+    Lists which are too small or have non numeric items are sorted with merge_sort in the current process.
+    """
+    n = len(items)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    typecode = _typecode(items)
+    if workers < 2 or n < MIN_CHUNK_SIZE * 2 or typecode is None:
+        merge_sort(items)
+        return
+
+    workers = min(workers, n / MIN_CHUNK_SIZE)
+    shared = RawArray(typecode, items)
+    size = (n + workers - 1) / workers
+    chunks = [(lo, min(lo + size, n)) for lo in xrange(0, n, size)]
+    pool = multiprocessing.Pool(workers, _init_worker, (shared,))
+    try:
+        pool.map(_sort_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+
+    # heapq.merge takes equal items from the earlier chunks first which keeps the sort stable
+    items[:] = heapq.merge(*[shared[lo:hi] for lo, hi in chunks])
+
+
+def _typecode(items):
+    """
+    Returns typecode of the shared buffer which can hold items without changing them
+    or None if there is no such typecode
+    """
+    if all(type(item) is int for item in items):
+        return 'l'
+    if all(type(item) is float for item in items):
+        return 'd'
+    return None
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _sort_chunk(bounds):
+    """
+    Sort the lo..hi-1 chunk of the shared buffer inplace
+    """
+    lo, hi = bounds
+    chunk = _shared[lo:hi]
+    merge_sort(chunk)
+    _shared[lo:hi] = chunk
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    for items in ([random.randint(0, 1000) for _ in xrange(500000)],
+                  [random.random() for _ in xrange(500000)],
+                  ['a', 'c', 'b']):
+        expected = items[:]
+        start = time.time()
+        merge_sort(expected)
+        print 'merge_sort {:.3f}s'.format(time.time() - start)
+        start = time.time()
+        parallel_merge_sort(items, workers=4)
+        print 'parallel_merge_sort {:.3f}s'.format(time.time() - start)
+        assert items == expected
@@ -1,4 +1,14 @@
 # -*- coding: utf-8 -*-
+import math
+import random
+from sorting.decorate import decorated_sort
+from sorting.insertion_sort import insertion_sort
+from priority_queues.heap_sort import heap_sort_bottom_up
+
+# subarrays smaller than this are sorted with insertion sort by introsort
+INSERTION_SORT_CUTOFF = 16
+# subarrays bigger than this use Tukey's ninther instead of median-of-three
+NINTHER_CUTOFF = 40
 
 
 def qsort_py(items):
@@ -13,21 +23,107 @@ def qsort_py(items):
         return items
 
 
-def qsort(items):
+def qsort(items, strategy='hoare', key=None, reverse=False):
     """
     Classical quick inline sort with 2-way partitioning (suggested by Tony Hoare in 1961)
-    It may run quadratic time in case of many duplicate items
+    It may run quadratic time in case of many duplicate items.
+    Use strategy='dual_pivot' for Yaroslavskiy's dual-pivot partitioning
+    which handles duplicate keys well.
     """
-    _sort(items, 0, len(items) - 1)
+    if key is not None or reverse:
+        decorated_sort(items, lambda decorated: qsort(_shuffled(decorated), strategy), key, reverse)
+        return
+    if strategy == 'hoare':
+        _sort(items, 0, len(items) - 1)
+    elif strategy == 'dual_pivot':
+        n = len(items)
+        if n > 1:
+            _sort_dual_pivot(items, 0, n - 1, 2 * int(math.log(n, 2)))
+    else:
+        raise ValueError('Unknown quick sort strategy "{}"'.format(strategy))
 
 
-def qsort_3w(items):
+def qsort_3w(items, key=None, reverse=False):
     """
     Quick sort suggested by Edsger Dijkstra
     """
+    if key is not None or reverse:
+        decorated_sort(items, lambda decorated: qsort_3w(_shuffled(decorated)), key, reverse)
+        return
     _sort_3w(items, 0, len(items) - 1)
 
 
+def _shuffled(decorated):
+    """
+    Equal keys become runs of (key, index) pairs in order which make the first item pivots quadratic,
+    shuffle them (indexes keep the sort stable)
+    """
+    random.shuffle(decorated)
+    return decorated
+
+
+def introsort(items, cutoff=INSERTION_SORT_CUTOFF):
+    """
+    Introspective sort suggested by David Musser in 1997
+    Quick sort with median-of-three (or ninther) pivot which switches to heap sort
+    when recursion gets too deep and to insertion sort for small subarrays.
+    It runs O(NlogN) in the worst case and uses O(logN) stack.
+    cutoff below 1 is the same as 1: single items are never partitioned.
+    """
+    n = len(items)
+    if n > 1:
+        _introsort(items, 0, n - 1, 2 * int(math.log(n, 2)), max(cutoff, 1))
+
+
+def _introsort(items, lo, hi, depth, cutoff):
+    """
+    Sorting function which recurses on the smaller part and loops on the larger one
+    """
+    while hi - lo + 1 > cutoff:
+        if depth == 0:
+            # too many bad pivots - quick sort goes quadratic, use heap sort instead
+            heap_sort_bottom_up(items, lo, hi)
+            return
+        depth -= 1
+        m = _choose_pivot(items, lo, hi)
+        items[lo], items[m] = items[m], items[lo]
+        pivot = _partition(items, lo, hi)
+        if pivot - lo < hi - pivot:
+            _introsort(items, lo, pivot - 1, depth, cutoff)
+            lo = pivot + 1
+        else:
+            _introsort(items, pivot + 1, hi, depth, cutoff)
+            hi = pivot - 1
+    insertion_sort(items, lo, hi)
+
+
+def _choose_pivot(items, lo, hi):
+    """
+    Returns index of the median-of-three for small subarrays and Tukey's ninther for big ones
+    """
+    mid = lo + (hi - lo) / 2
+    if hi - lo + 1 > NINTHER_CUTOFF:
+        eps = (hi - lo + 1) / 8
+        a = _median3(items, lo, lo + eps, lo + 2 * eps)
+        b = _median3(items, mid - eps, mid, mid + eps)
+        c = _median3(items, hi - 2 * eps, hi - eps, hi)
+        return _median3(items, a, b, c)
+    return _median3(items, lo, mid, hi)
+
+
+def _median3(items, i, j, k):
+    """
+    Returns index of the median item among items[i], items[j] and items[k]
+    """
+    if items[i] < items[j]:
+        if items[j] < items[k]:
+            return j
+        return k if items[i] < items[k] else i
+    if items[k] < items[j]:
+        return j
+    return i if items[i] < items[k] else k
+
+
 def _sort_3w(items, lo, hi):
     """
     Recursive sorting function with 3-way partitioning
@@ -52,6 +148,89 @@ def _sort_3w(items, lo, hi):
     _sort_3w(items, gt + 1, hi)
 
 
+def _sort_dual_pivot(items, lo, hi, depth):
+    """
+    Sorting function with dual-pivot partitioning (suggested by Vladimir Yaroslavskiy in 2009)
+    Items are split into three parts: less than p1, between p1 and p2, greater than p2.
+    Pivots are the tertiles of 5 samples. It recurses on the two smaller parts and loops on the largest one,
+    switches to heap sort when recursion gets too deep and to insertion sort for small subarrays.
+    """
+    while hi - lo + 1 > INSERTION_SORT_CUTOFF:
+        if depth == 0:
+            heap_sort_bottom_up(items, lo, hi)
+            return
+        depth -= 1
+        _choose_pivots(items, lo, hi)
+        p1 = items[lo]
+        p2 = items[hi]
+        lt = lo + 1
+        gt = hi - 1
+        i = lo + 1
+        while i <= gt:
+            if items[i] < p1:
+                items[lt], items[i] = items[i], items[lt]
+                lt += 1
+                i += 1
+            elif p2 < items[i]:
+                items[gt], items[i] = items[i], items[gt]
+                gt -= 1
+            else:
+                i += 1
+        # put pivots in their final places
+        lt -= 1
+        gt += 1
+        items[lo], items[lt] = items[lt], items[lo]
+        items[hi], items[gt] = items[gt], items[hi]
+
+        parts = [(lo, lt - 1), (gt + 1, hi)]
+        # equal pivots mean that all the middle items are equal to them as well
+        if p1 < p2:
+            if (gt - lt) * 3 > (hi - lo) * 2:
+                # the middle part is too big, it's likely to have many keys equal to pivots:
+                # move them to the ends of the middle part and exclude from sorting
+                lt, gt = _exclude_equal(items, lt + 1, gt - 1, p1, p2)
+            parts.append((lt + 1, gt - 1))
+        parts.sort(key=lambda part: part[1] - part[0])
+        for left, right in parts[:-1]:
+            _sort_dual_pivot(items, left, right, depth)
+        lo, hi = parts[-1]
+    insertion_sort(items, lo, hi)
+
+
+def _choose_pivots(items, lo, hi):
+    """
+    Sorts 5 evenly spaced samples and moves the 2nd and the 4th ones (tertiles) to lo and hi
+    """
+    step = (hi - lo + 1) / 6
+    positions = [lo + step * k for k in xrange(1, 6)]
+    samples = sorted(items[k] for k in positions)
+    for k, sample in zip(positions, samples):
+        items[k] = sample
+    items[lo], items[positions[1]] = items[positions[1]], items[lo]
+    items[hi], items[positions[3]] = items[positions[3]], items[hi]
+
+
+def _exclude_equal(items, lo, hi, p1, p2):
+    """
+    Moves items equal to p1 to the left and items equal to p2 to the right of lo..hi range.
+    Returns bounds (exclusive) of the remaining items which are strictly between p1 and p2.
+    """
+    lt = lo
+    gt = hi
+    i = lo
+    while i <= gt:
+        if items[i] == p1:
+            items[lt], items[i] = items[i], items[lt]
+            lt += 1
+            i += 1
+        elif items[i] == p2:
+            items[gt], items[i] = items[i], items[gt]
+            gt -= 1
+        else:
+            i += 1
+    return lt - 1, gt + 1
+
+
 def _sort(items, lo, hi):
     """
     Recursive sorting function
@@ -85,8 +264,10 @@ def _partition(items, lo, hi):
         if left >= right:
             break
 
-        # swap items
+        # swap items and step over them (otherwise equal items would be swapped forever)
         items[left], items[right] = items[right], items[left]
+        left += 1
+        right -= 1
 
     # swap partitioning item with the biggest on the left side (which is less than lo)
     items[lo], items[right] = items[right], items[lo]
@@ -106,4 +287,49 @@ if __name__ == '__main__':
     assert is_sorted(items)
     random.shuffle(items)
     items = qsort_py(items)
-    assert is_sorted(items)
\ No newline at end of file
+    assert is_sorted(items)
+    random.shuffle(items)
+    introsort(items)
+    assert is_sorted(items)
+    for cutoff in (0, 1, 2, 64):
+        for items in ([2, 1], [3, 1, 2], [random.randint(0, 50) for _ in xrange(1000)]):
+            a = items[:]
+            introsort(a, cutoff)
+            assert a == sorted(items)
+    # already sorted, reversed and duplicate-heavy inputs must not go quadratic
+    for items in (range(100000), range(100000, 0, -1), [random.randint(0, 3) for _ in xrange(100000)]):
+        for sort in (introsort, lambda a: qsort(a, strategy='dual_pivot')):
+            a = items[:]
+            sort(a)
+            assert is_sorted(a)
+    # organ pipe and sawtooth inputs
+    for items in (range(50000) + range(50000, 0, -1), [i % 1000 for i in xrange(100000)]):
+        qsort(items, strategy='dual_pivot')
+        assert is_sorted(items)
+    # equal keys are decorated into sorted (key, index) runs
+    items = [random.randint(0, 1) for _ in xrange(5000)]
+    for sort in (qsort, qsort_3w, lambda a, **kwargs: qsort(a, strategy='dual_pivot', **kwargs)):
+        a = items[:]
+        sort(a, key=lambda x: 0)
+        assert a == items
+        sort(a, key=lambda x: -x, reverse=True)
+        assert a == sorted(items)
+    items = [5, 5, 5]
+    qsort(items)
+    assert items == [5, 5, 5]
+    random.shuffle(items)
+    qsort(items, strategy='dual_pivot')
+    assert is_sorted(items)
+
+    # benchmark dual-pivot against 3-way partitioning on Zipfian distributed keys
+    import time
+    from sorting.benchmark import zipfian
+
+    for distinct in (10, 1000, 100000):
+        items = zipfian(200000, random, distinct)
+        for name, sort in (('qsort_3w', qsort_3w), ('dual_pivot', lambda a: qsort(a, strategy='dual_pivot'))):
+            a = items[:]
+            start = time.time()
+            sort(a)
+            print '{:>10} distinct={:<6} {:.3f}s'.format(name, distinct, time.time() - start)
+            assert is_sorted(a)
\ No newline at end of file
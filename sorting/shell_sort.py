@@ -1,17 +1,99 @@
 # -*- coding: utf-8 -*-
+"""
+Optional requirements:
+numpy (for shell_sort_batched)
+"""
+from array import array
+from sorting.decorate import decorated_sort
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def shell_sort(items):
+
+# gap sequences: every function returns increasing gaps (starting with 1) for a list of size n
+
+def knuth_gaps(n):
+    """
+    1, 4, 13, 40, 121, ... (3h + 1) proposed by Knuth
+    """
+    gaps = [1]
+    while gaps[-1] < n / 3:
+        gaps.append(gaps[-1] * 3 + 1)
+    return gaps
+
+
+def sedgewick_gaps(n):
+    """
+    1, 8, 23, 77, 281, ... (4^k + 3 * 2^(k-1) + 1) proposed by Sedgewick in 1982
+    """
+    gaps = [1]
+    k = 1
+    while 4 ** k + 3 * 2 ** (k - 1) + 1 < n:
+        gaps.append(4 ** k + 3 * 2 ** (k - 1) + 1)
+        k += 1
+    return gaps
+
+
+def ciura_gaps(n):
+    """
+    1, 4, 10, 23, 57, 132, 301, 701, 1750 found empirically by Ciura in 2001
+    and extended with h = 2.25h for bigger lists
+    """
+    gaps = [1]
+    for h in (4, 10, 23, 57, 132, 301, 701, 1750):
+        if h >= n:
+            return gaps
+        gaps.append(h)
+    while int(gaps[-1] * 2.25) < n:
+        gaps.append(int(gaps[-1] * 2.25))
+    return gaps
+
+
+def tokuda_gaps(n):
+    """
+    1, 4, 9, 20, 46, 103, 233, ... (ceil((9 * (9/4)^k - 4) / 5)) proposed by Tokuda in 1992
+    """
+    gaps = [1]
+    k = 1
+    while True:
+        h = int(-(-(9 * 2.25 ** k - 4) // 5))
+        if h >= n:
+            return gaps
+        gaps.append(h)
+        k += 1
+
+
+GAPS = {
+    'knuth': knuth_gaps,
+    'sedgewick': sedgewick_gaps,
+    'ciura': ciura_gaps,
+    'tokuda': tokuda_gaps,
+}
+
+
+def _gaps(gaps, n):
+    """
+    Gap sequence for the list of size n: gaps is a name from GAPS or a function
+    """
+    if callable(gaps):
+        return gaps(n)
+    if gaps not in GAPS:
+        raise ValueError('Unknown gap sequence "{}"'.format(gaps))
+    return GAPS[gaps](n)
+
+
+def shell_sort(items, key=None, reverse=False, gaps='knuth'):
     """
     Shell sort
+    Gap sequence can be chosen by name (knuth, sedgewick, ciura, tokuda) or given as a function of n
     """
+    if key is not None or reverse:
+        decorated_sort(items, lambda decorated: shell_sort(decorated, gaps=gaps), key, reverse)
+        return
     n = len(items)
-    h = 1
-    # compute h with formula proposed by Knuth
-    while h < n / 3:
-        h = h * 3 + 1
-
-    while h >= 1:
+    for h in reversed(_gaps(gaps, n)):
         # iterate over every item
         for i in xrange(n):
             j = i
@@ -20,15 +102,78 @@ def shell_sort(items):
                 # exchange those items
                 items[j], items[j - h] = items[j - h], items[j]
                 j -= h
-        # get the value of h for each iteration
-        h /= 3
+
+
+def shell_sort_batched(items, gaps='ciura'):
+    """
+    Shell sort for numeric array.array or numpy array where every h-sort pass is vectorized:
+    the buffer is viewed as a matrix with h columns (every column is an h-chain) and all the chains
+    are sorted at once with odd-even transposition passes. Previous passes leave the chains almost sorted,
+    so only a few of these passes are needed.
+    Falls back to shell_sort if numpy is not installed.
+    """
+    if numpy is None:
+        data = list(items)
+        shell_sort(data, gaps=gaps)
+        items[:] = array(items.typecode, data) if isinstance(items, array) else data
+        return
+    if isinstance(items, array):
+        # zero copy view: items are sorted in the memory of the array
+        items = numpy.frombuffer(items, dtype=items.typecode)
+    n = len(items)
+    if n < 2:
+        return
+    if numpy.issubdtype(items.dtype, numpy.floating):
+        top = numpy.inf
+    else:
+        top = numpy.iinfo(items.dtype).max
+    for h in reversed(_gaps(gaps, n)):
+        # pad the buffer with max values to get the full matrix, padding stays at the end
+        rows = -(-n // h)
+        grid = numpy.empty(rows * h, dtype=items.dtype)
+        grid[:n] = items
+        grid[n:] = top
+        grid = grid.reshape(rows, h)
+        _h_sort(grid)
+        items[:] = grid.reshape(-1)[:n]
+
+
+def _h_sort(grid):
+    """
+    Sorts every column of the matrix with odd-even transposition sort
+    """
+    rows = len(grid)
+    changed = True
+    while changed:
+        changed = False
+        for start in (0, 1):
+            upper = grid[start:rows - 1:2]
+            lower = grid[start + 1:rows:2]
+            if (lower < upper).any():
+                changed = True
+                smaller = numpy.minimum(upper, lower)
+                lower[...] = numpy.maximum(upper, lower)
+                upper[...] = smaller
 
 
 if __name__ == '__main__':
     import random
-    from check_sorting import is_sorted
+    import time
+    from sorting.check_sorting import is_sorted
+    from sorting.instrument import profile
 
     items = range(100)
     random.shuffle(items)
     shell_sort(items)
-    assert is_sorted(items)
\ No newline at end of file
+    assert is_sorted(items)
+
+    for name in sorted(GAPS):
+        items = [random.random() for _ in xrange(20000)]
+        stats = profile(lambda items: shell_sort(items, gaps=name), items)
+        assert is_sorted(items)
+        items = array('d', (random.random() for _ in xrange(200000)))
+        start = time.time()
+        shell_sort_batched(items, gaps=name)
+        assert is_sorted(items)
+        print '{:>10}: {} comparisons (20k items), batched {:.3f}s (200k items)'.format(
+            name, stats.comparisons, time.time() - start)
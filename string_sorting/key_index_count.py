@@ -33,7 +33,7 @@ def key_index_sort(items, maxnum):
         sub = 0 if c == 0 else count[c - 1]
         diff = count[c] - sub
         for d in xrange(diff):
-            a[r] = c
+            items[r] = c
             r += 1
 
 if __name__ == '__main__':
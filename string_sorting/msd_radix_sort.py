@@ -36,7 +36,6 @@ def msd_radix_sort(strings):
                 pass
         for i in xrange(lo, hi + 1):
             strings[i] = aux[i - lo]
-        print strings
         # sort subarrays recursively
         for r in xrange(radix - 1):
             sort(strings, aux, d + 1, lo + count[r], lo + count[r + 1] - 1)
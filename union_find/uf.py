@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+from array import array
 from collections import defaultdict
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class UnionFind(object):
     """
@@ -24,9 +30,12 @@ class UnionFind(object):
         return p
 
     def union(self, p, q):
+        """
+        Connect p and q, returns False if they are connected already
+        """
         i, j = self.find(p), self.find(q)
         if i == j:
-            return
+            return False
         # make the root of the smaller rank point to the root of the larger rank
         if self.rank[i] < self.rank[j]:
             self.id[i] = j
@@ -35,10 +44,186 @@ class UnionFind(object):
         else:
             self.id[j] = i
             self.rank[i] += 1
+        return True
+
+    def connected(self, p, q):
+        return self.find(p) == self.find(q)
+
+    def union_many(self, pairs):
+        """
+        Connect every (p, q) pair, returns the number of pairs which joined two components
+        """
+        union = self.union
+        merged = 0
+        for p, q in pairs:
+            if union(p, q):
+                merged += 1
+        return merged
+
+    def find_many(self, items):
+        """
+        Returns the list of roots of the items
+        """
+        find = self.find
+        return [find(p) for p in items]
+
+    def connected_many(self, pairs):
+        """
+        Returns the list of connectivity flags of (p, q) pairs
+        """
+        find = self.find
+        return [find(p) == find(q) for p, q in pairs]
+
+
+class DenseUnionFind(object):
+    """
+    Union find of the integer elements 0..n-1
+    Parents and component sizes are kept in array('i'), so there are no dict lookups
+    and no boxed ints: every element costs 8 bytes.
+    This implementation uses weighted quick union by size with path compression by halving.
+    Batch operations take sequences or numpy arrays: arrays are processed in a few vectorized passes
+    with full path compression (pointer jumping), see union_many.
+    """
+
+    def __init__(self, n):
+        if n < 0:
+            raise ValueError('Number of elements must not be negative: {}'.format(n))
+        self.id = array('i', xrange(n))
+        self.size = array('i', [1]) * n
+        # number of components
+        self.count = n
+
+    def find(self, p):
+        if p < 0:
+            # array would count negative indexes from the end
+            raise IndexError('Element must not be negative: {}'.format(p))
+        id = self.id
+        parent = id[p]
+        while p != parent:
+            # path compression by halving
+            grandparent = id[parent]
+            id[p] = grandparent
+            p = grandparent
+            parent = id[p]
+        return p
+
+    def union(self, p, q):
+        """
+        Connect p and q, returns False if they are connected already
+        """
+        find = self.find
+        i, j = find(p), find(q)
+        if i == j:
+            return False
+        # make the root of the smaller tree point to the root of the larger one
+        size = self.size
+        if size[i] < size[j]:
+            i, j = j, i
+        self.id[j] = i
+        size[i] += size[j]
+        self.count -= 1
+        return True
 
     def connected(self, p, q):
         return self.find(p) == self.find(q)
 
+    def _views(self):
+        """
+        numpy arrays which share memory with parents and sizes
+        """
+        return numpy.frombuffer(self.id, dtype=numpy.intc), numpy.frombuffer(self.size, dtype=numpy.intc)
+
+    def compress(self):
+        """
+        Make every element point to its root: parents are replaced with grandparents
+        for all the elements at once until nothing changes, it takes O(log(height)) vectorized passes
+        """
+        parent, _ = self._views()
+        while True:
+            grandparent = parent[parent]
+            if numpy.array_equal(grandparent, parent):
+                return
+            parent[:] = grandparent
+
+    def union_many(self, pairs):
+        """
+        Connect every (p, q) pair, returns the number of pairs which joined two components.
+        Pairs in numpy array of shape (k, 2) are joined in rounds: the trees are compressed,
+        the bigger root of every pair which is still not connected is hooked to the smaller one
+        (hooking to smaller roots never makes cycles, a root with many candidates takes the smallest one,
+        so every pair makes progress and a hub is joined to all its neighbours in two rounds).
+        Component sizes are recounted at the end.
+        """
+        if numpy is None or not isinstance(pairs, numpy.ndarray):
+            union = self.union
+            merged = 0
+            for p, q in pairs:
+                if union(p, q):
+                    merged += 1
+            return merged
+        p, q = pairs[:, 0], pairs[:, 1]
+        if len(pairs) and min(p.min(), q.min()) < 0:
+            raise IndexError('Elements must not be negative')
+        parent, size = self._views()
+        while len(p):
+            self.compress()
+            i, j = parent[p], parent[q]
+            apart = i != j
+            if not apart.any():
+                break
+            p, q, i, j = p[apart], q[apart], i[apart], j[apart]
+            # unbuffered: every candidate counts, not only the last write to the same root
+            numpy.minimum.at(parent, numpy.maximum(i, j), numpy.minimum(i, j))
+        self.compress()
+        size[:] = numpy.bincount(parent, minlength=len(parent))
+        count = int(numpy.count_nonzero(parent == numpy.arange(len(parent))))
+        merged = self.count - count
+        self.count = count
+        return merged
+
+    def find_many(self, items):
+        """
+        Returns the roots of the items: numpy array for numpy array of items, list otherwise
+        """
+        if numpy is None or not isinstance(items, numpy.ndarray):
+            find = self.find
+            return [find(p) for p in items]
+        if len(items) and items.min() < 0:
+            raise IndexError('Elements must not be negative')
+        parent, _ = self._views()
+        # pointer jumping on the queried items only, it costs O(k * height) instead of O(N) of compress()
+        roots = parent[items]
+        while True:
+            up = parent[roots]
+            if numpy.array_equal(up, roots):
+                return roots
+            roots = up
+
+    def connected_many(self, pairs):
+        """
+        Returns connectivity flags of (p, q) pairs: numpy array for numpy array of pairs, list otherwise
+        """
+        if numpy is None or not isinstance(pairs, numpy.ndarray):
+            find = self.find
+            return [find(p) == find(q) for p, q in pairs]
+        return self.find_many(pairs[:, 0]) == self.find_many(pairs[:, 1])
+
+    def __len__(self):
+        return len(self.id)
+
+
+def label_components(n, edges):
+    """
+    Label connected components of the graph with vertices 0..n-1 and (v, w) edges:
+    returns the number of components and the component label (its root) of every vertex.
+    Edges in numpy array of shape (k, 2) are processed in bulk.
+    """
+    uf = DenseUnionFind(n)
+    uf.union_many(edges)
+    if numpy is not None and isinstance(edges, numpy.ndarray):
+        return uf.count, uf.find_many(numpy.arange(n))
+    return uf.count, uf.find_many(xrange(n))
+
 
 if __name__ == '__main__':
     uf = UnionFind()
@@ -49,3 +234,81 @@ if __name__ == '__main__':
     uf.union(6, 5)
     uf.union(7, 5)
     assert uf.find(7) == uf.find(5)
+
+    import random
+    import sys
+    import time
+
+    n = 1000000
+    pairs = [(random.randrange(n), random.randrange(n)) for _ in xrange(n)]
+    for cls in (UnionFind, DenseUnionFind):
+        uf = cls() if cls is UnionFind else cls(n)
+        start = time.time()
+        for p in xrange(n):
+            uf.find(p)
+        for p, q in pairs:
+            uf.union(p, q)
+        connected = sum(1 for p, q in pairs[:n / 10] if uf.connected(p, q + 1 if q + 1 < n else 0))
+        elapsed = time.time() - start
+        if cls is UnionFind:
+            # dicts and the ints above the small ints cache
+            memory = sys.getsizeof(uf.id) + sys.getsizeof(uf.rank) + n * sys.getsizeof(n)
+            components = len(set(uf.find(p) for p in xrange(n)))
+        else:
+            memory = uf.id.itemsize * len(uf.id) + uf.size.itemsize * len(uf.size)
+            assert uf.count == components
+        print '{:>14}: {:.3f}s, ~{:.1f}MB, {} components, {} connected'.format(
+            cls.__name__, elapsed, memory / 1e6, components, connected)
+
+    # batches: the same unions in Python loops and in vectorized passes
+    start = time.time()
+    uf = UnionFind()
+    uf.union_many(pairs)
+    print '{:>34}: {:.3f}s'.format('UnionFind.union_many', time.time() - start)
+    expected = DenseUnionFind(n)
+    start = time.time()
+    expected.union_many(pairs)
+    print '{:>34}: {:.3f}s'.format('DenseUnionFind.union_many(list)', time.time() - start)
+    if numpy is not None:
+        edges = numpy.array(pairs, dtype=numpy.intc)
+        dense = DenseUnionFind(n)
+        start = time.time()
+        merged = dense.union_many(edges)
+        roots = dense.find_many(numpy.arange(n))
+        print '{:>34}: {:.3f}s'.format('DenseUnionFind.union_many(numpy)', time.time() - start)
+        assert merged == n - dense.count and dense.count == expected.count
+        assert dense.connected_many(edges).all()
+        assert dense.find_many(range(1000)) == list(roots[:1000])
+        assert sum(dense.size) == n
+        # the same partition as the scalar unions: both agree on random pairs
+        labels = expected.find_many(xrange(n))
+        sample = [(random.randrange(n), random.randrange(n)) for _ in xrange(10000)]
+        assert ([labels[p] == labels[q] for p, q in sample] ==
+                list(dense.connected_many(numpy.array(sample, dtype=numpy.intc))))
+    count, _ = label_components(10, [(0, 1), (1, 2), (5, 6)])
+    assert count == 7
+
+    if numpy is not None:
+        # star: every edge points at the hub with the biggest id
+        for size in (1000, 4000, 16000):
+            hub = numpy.full(size - 1, size - 1, dtype=numpy.intc)
+            leaves = numpy.arange(size - 1, dtype=numpy.intc)
+            start = time.time()
+            count, labels = label_components(size, numpy.column_stack((hub, leaves)))
+            elapsed = time.time() - start
+            assert count == 1 and (labels == 0).all()
+            print '{:>34}: {:.3f}s'.format('star of {} union_many(numpy)'.format(size), elapsed)
+
+        # a few lookups do not touch the whole array
+        uf = DenseUnionFind(n)
+        for p in xrange(1, 1000):
+            uf.union(p - 1, p)
+        queries = numpy.array([[0, 999], [0, 1000], [500, 2]], dtype=numpy.intc)
+        before = uf.id[:]
+        start = time.time()
+        for _ in xrange(1000):
+            flags = uf.connected_many(queries)
+        elapsed = time.time() - start
+        assert list(flags) == [True, False, True]
+        assert uf.id == before
+        print '{:>34}: {:.1f}us'.format('connected_many of 3 pairs', elapsed * 1000)